@@ -21,7 +21,7 @@ if ! command -v psql &> /dev/null; then
 fi
 
 echo "[1/5] Checking database..."
-if ! psql -U postgres -lqt | cut -d \| -f 1 | grep -qw NEMIS; then
+if [ "$(psql -U postgres -tAc "SELECT 1 FROM pg_database WHERE datname = 'NEMIS'")" != "1" ]; then
     echo "Creating NEMIS database..."
     psql -U postgres -c "CREATE DATABASE NEMIS;" || exit 1
     
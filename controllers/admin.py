@@ -5,13 +5,30 @@ candidate approval, results viewing, and system administration
 FIXED: require_admin() now accepts Election Officer role
 """
 
-from flask import Blueprint, render_template, request, redirect, session, flash
-from db import get_connection
-from utils import log_audit, get_election_status
+from flask import (Blueprint, render_template, stream_template, request, redirect,
+                   session, flash, get_flashed_messages)
+from flask_wtf.csrf import generate_csrf
+from db import get_db, execute_prepared
+from utils import (log_audit, get_dashboard_statistics, get_regions, parse_iso,
+                   start_change_listener, validate_cnie, validate_name)
 from datetime import datetime
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 
+# Rows fetched per round trip when streaming unbounded listings
+LISTING_ITERSIZE = 200
+
+def stream_rows(cur):
+    """
+    Yield the rows of a server-side cursor, closing it when done
+    The request connection itself is returned by the teardown hook once
+    the streamed response has finished
+    """
+    try:
+        yield from cur
+    finally:
+        cur.close()
+
 def require_admin():
     """
     Middleware to check if user is admin or election officer
@@ -35,46 +52,12 @@ def dashboard():
     if check:
         return check
     
-    conn = get_connection()
-    cur = conn.cursor()
-    
-    # Get statistics
-    cur.execute("SELECT COUNT(*) FROM User_account WHERE role = 'Voter'")
-    result = cur.fetchone()
-    total_voters = result[0] if result else 0
-    
-    cur.execute("SELECT COUNT(*) FROM Election")
-    result = cur.fetchone()
-    total_elections = result[0] if result else 0
-    
-    cur.execute("SELECT COUNT(*) FROM Candidate")
-    result = cur.fetchone()
-    total_candidates = result[0] if result else 0
-    
-    cur.execute("SELECT COUNT(*) FROM Vote")
-    result = cur.fetchone()
-    total_votes = result[0] if result else 0
-    
-    # Get recent elections
-    cur.execute("""
-        SELECT Election_ID, name, type, start_date, end_date, status 
-        FROM Election 
-        ORDER BY created_at DESC 
-        LIMIT 5
-    """)
-    recent_elections = cur.fetchall()
-    
-    cur.close()
-    conn.close()
+    # Cached per process for a few seconds (see utils.get_dashboard_statistics)
+    statistics = get_dashboard_statistics()
     
     log_audit("Viewed admin dashboard")
     
-    return render_template("admin_dashboard.html", 
-                         total_voters=total_voters,
-                         total_elections=total_elections,
-                         total_candidates=total_candidates,
-                         total_votes=total_votes,
-                         recent_elections=recent_elections)
+    return render_template("admin_dashboard.html", **statistics)
 
 # Election Management
 @admin_bp.route("/elections")
@@ -83,12 +66,20 @@ def elections():
     if check:
         return check
     
-    conn = get_connection()
+    conn = get_db(autocommit=True)
     cur = conn.cursor()
     
+    # Status is derived from the dates in SQL, the same way as
+    # utils.get_election_status (Cancelled/Completed are kept as stored)
     cur.execute("""
         SELECT e.Election_ID, e.name, e.type, e.start_date, e.end_date, 
-               e.status, u.name as admin_name
+               CASE
+                   WHEN e.status NOT IN ('Planned', 'Active') THEN e.status
+                   WHEN LOCALTIMESTAMP < e.start_date THEN 'Planned'
+                   WHEN LOCALTIMESTAMP <= e.end_date THEN 'Active'
+                   ELSE 'Completed'
+               END AS status,
+               u.name as admin_name
         FROM Election e
         LEFT JOIN User_account u ON e.Admin_ID = u.User_ID
         ORDER BY e.created_at DESC
@@ -96,7 +87,6 @@ def elections():
     elections = cur.fetchall()
     
     cur.close()
-    conn.close()
     
     return render_template("admin_elections.html", elections=elections)
 
@@ -122,16 +112,22 @@ def create_election():
             flash("Please select at least one region", "error")
             return redirect("/admin/elections/create")
         
-        conn = get_connection()
+        conn = get_db()
         cur = conn.cursor()
         
         try:
-            # Insert election
+            # Insert election and associate regions in one statement
             cur.execute("""
-                INSERT INTO Election (name, type, start_date, end_date, Admin_ID, status)
-                VALUES (%s, %s, %s, %s, %s, 'Planned')
-                RETURNING Election_ID
-            """, (name, election_type, start_date, end_date, session["user"]["id"]))
+                WITH e AS (
+                    INSERT INTO Election (name, type, start_date, end_date, Admin_ID, status)
+                    VALUES (%s, %s, %s, %s, %s, 'Planned')
+                    RETURNING Election_ID
+                ), er AS (
+                    INSERT INTO Election_Region (Election_ID, Region_ID)
+                    SELECT e.Election_ID, unnest(%s::int[]) FROM e
+                )
+                SELECT Election_ID FROM e
+            """, (name, election_type, start_date, end_date, session["user"]["id"], region_ids))
             
             result = cur.fetchone()
             election_id = result[0] if result else None
@@ -139,38 +135,22 @@ def create_election():
             if not election_id:
                 raise Exception("Failed to create election")
             
-            # Associate regions
-            for region_id in region_ids:
-                cur.execute("""
-                    INSERT INTO Election_Region (Election_ID, Region_ID)
-                    VALUES (%s, %s)
-                """, (election_id, region_id))
-            
             conn.commit()
             log_audit("Created election", "Election", election_id, f"Election: {name}")
             flash(f"Election '{name}' created successfully!", "success")
             
             cur.close()
-            conn.close()
             
             return redirect("/admin/elections")
             
         except Exception as e:
             conn.rollback()
             cur.close()
-            conn.close()
             flash(f"Error creating election: {str(e)}", "error")
             return redirect("/admin/elections/create")
     
     # GET - show form
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT Region_ID, name FROM Region ORDER BY name")
-    regions = cur.fetchall()
-    cur.close()
-    conn.close()
-    
-    return render_template("admin_create_election.html", regions=regions)
+    return render_template("admin_create_election.html", regions=get_regions())
 
 @admin_bp.route("/elections/<int:election_id>/edit", methods=["GET", "POST"])
 def edit_election(election_id):
@@ -178,7 +158,7 @@ def edit_election(election_id):
     if check:
         return check
     
-    conn = get_connection()
+    conn = get_db()
     cur = conn.cursor()
     
     if request.method == "POST":
@@ -205,14 +185,12 @@ def edit_election(election_id):
             flash(f"Election '{name}' updated successfully!", "success")
             
             cur.close()
-            conn.close()
             
             return redirect("/admin/elections")
             
         except Exception as e:
             conn.rollback()
             cur.close()
-            conn.close()
             flash(f"Error updating election: {str(e)}", "error")
             return redirect(f"/admin/elections/{election_id}/edit")
     
@@ -225,12 +203,10 @@ def edit_election(election_id):
     
     if not election:
         cur.close()
-        conn.close()
         flash("Election not found", "error")
         return redirect("/admin/elections")
     
     cur.close()
-    conn.close()
     
     return render_template("admin_edit_election.html", election=election)
 
@@ -241,10 +217,13 @@ def candidates():
     if check:
         return check
     
-    conn = get_connection()
-    cur = conn.cursor()
+    # Not autocommit: the server-side cursor below lives in a transaction
+    conn = get_db()
     
-    cur.execute("""
+    # Streamed to the template LISTING_ITERSIZE rows per round trip
+    candidates = conn.cursor(name="admin_candidates")
+    candidates.itersize = LISTING_ITERSIZE
+    candidates.execute("""
         SELECT c.Candidate_ID, u.name, u.CNIE, c.party_name, 
                r.name as region, e.name as election, c.is_approved
         FROM Candidate c
@@ -253,12 +232,14 @@ def candidates():
         JOIN Election e ON c.Election_ID = e.Election_ID
         ORDER BY c.registration_date DESC
     """)
-    candidates = cur.fetchall()
     
-    cur.close()
-    conn.close()
+    # Stream the page: the response starts with the first rows while later
+    # ones are still being fetched. Flashes and the CSRF token are resolved
+    # up front because the session cannot be saved once streaming starts
+    get_flashed_messages(with_categories=True)
+    generate_csrf()
     
-    return render_template("admin_candidates.html", candidates=candidates)
+    return stream_template("admin_candidates.html", candidates=stream_rows(candidates))
 
 @admin_bp.route("/candidates/<int:candidate_id>/approve", methods=["POST"])
 def approve_candidate(candidate_id):
@@ -266,7 +247,7 @@ def approve_candidate(candidate_id):
     if check:
         return check
     
-    conn = get_connection()
+    conn = get_db()
     cur = conn.cursor()
     
     try:
@@ -285,7 +266,6 @@ def approve_candidate(candidate_id):
         flash(f"Error approving candidate: {str(e)}", "error")
     
     cur.close()
-    conn.close()
     
     return redirect("/admin/candidates")
 
@@ -295,7 +275,7 @@ def reject_candidate(candidate_id):
     if check:
         return check
     
-    conn = get_connection()
+    conn = get_db()
     cur = conn.cursor()
     
     try:
@@ -314,7 +294,6 @@ def reject_candidate(candidate_id):
         flash(f"Error rejecting candidate: {str(e)}", "error")
     
     cur.close()
-    conn.close()
     
     return redirect("/admin/candidates")
 
@@ -325,7 +304,7 @@ def results():
     if check:
         return check
     
-    conn = get_connection()
+    conn = get_db(autocommit=True)
     cur = conn.cursor()
     
     # Get all elections
@@ -333,7 +312,6 @@ def results():
     elections = cur.fetchall()
     
     cur.close()
-    conn.close()
     
     return render_template("admin_results.html", elections=elections)
 
@@ -343,42 +321,51 @@ def election_results(election_id):
     if check:
         return check
     
-    conn = get_connection()
+    conn = get_db(autocommit=True)
     cur = conn.cursor()
     
     # Get election info
-    cur.execute("SELECT name, type, status FROM Election WHERE Election_ID = %s", (election_id,))
+    execute_prepared(cur, "admin_election_info",
+                     "SELECT name, type, status FROM Election WHERE Election_ID = $1", (election_id,))
     election = cur.fetchone()
     
     if not election:
         cur.close()
-        conn.close()
         flash("Election not found", "error")
         return redirect("/admin/results")
     
-    # Get results using the view
-    cur.execute("""
-        SELECT candidate_name, party_name, region_name, vote_count, vote_percentage
-        FROM Election_Results
-        WHERE Election_ID = %s
+    # Get results from the materialized view; the change listener keeps it
+    # within RESULTS_REFRESH_INTERVAL seconds of the latest vote
+    start_change_listener()
+    execute_prepared(cur, "admin_election_results", """
+        SELECT candidate_name, party_name, region_name, vote_count,
+               COALESCE(vote_percentage_in_region, 0)
+        FROM mv_election_results
+        WHERE Election_ID = $1
         ORDER BY vote_count DESC
     """, (election_id,))
     results = cur.fetchall()
     
-    # Get voter statistics by region
-    cur.execute("""
-        SELECT r.name, COUNT(DISTINCT v.Voter_ID) as voted,
-               COUNT(DISTINCT vo.Voter_ID) as total
+    # Get voter statistics by region: registered voters and this election's
+    # votes are counted per region separately, then joined on the small totals
+    # (Vote is UNIQUE on (Voter_ID, Election_ID), so each vote is one voter)
+    execute_prepared(cur, "admin_election_turnout", """
+        SELECT r.name, COALESCE(v.voted, 0) as voted,
+               COALESCE(t.total, 0) as total
         FROM Region r
-        LEFT JOIN Voter vo ON r.Region_ID = vo.Region_ID
-        LEFT JOIN Vote v ON vo.Voter_ID = v.Voter_ID AND v.Election_ID = %s
-        GROUP BY r.name
+        LEFT JOIN (SELECT Region_ID, COUNT(*) AS total
+                   FROM Voter
+                   GROUP BY Region_ID) t ON t.Region_ID = r.Region_ID
+        LEFT JOIN (SELECT vo.Region_ID, COUNT(*) AS voted
+                   FROM Vote v
+                   JOIN Voter vo ON vo.Voter_ID = v.Voter_ID
+                   WHERE v.Election_ID = $1
+                   GROUP BY vo.Region_ID) v ON v.Region_ID = r.Region_ID
         ORDER BY r.name
     """, (election_id,))
     turnout = cur.fetchall()
     
     cur.close()
-    conn.close()
     
     log_audit("Viewed election results", "Election", election_id)
     
@@ -395,20 +382,24 @@ def users():
     if check:
         return check
     
-    conn = get_connection()
-    cur = conn.cursor()
+    # Not autocommit: the server-side cursor below lives in a transaction
+    conn = get_db()
     
-    cur.execute("""
+    # Streamed to the template LISTING_ITERSIZE rows per round trip
+    users = conn.cursor(name="admin_users")
+    users.itersize = LISTING_ITERSIZE
+    users.execute("""
         SELECT User_ID, CNIE, name, role, created_at
         FROM User_account
         ORDER BY created_at DESC
     """)
-    users = cur.fetchall()
     
-    cur.close()
-    conn.close()
+    # Render while the cursor is still open, then end the read transaction
+    page = render_template("admin_users.html", users=users)
+    users.close()
+    conn.rollback()
     
-    return render_template("admin_users.html", users=users)
+    return page
 
 @admin_bp.route("/users/create", methods=["GET", "POST"])
 def create_user():
@@ -423,8 +414,6 @@ def create_user():
         region_id = request.form.get("region_id")
         
         # Validation (ENHANCED)
-        from utils import validate_cnie, validate_name
-        
         if not validate_cnie(cnie):
             flash("Invalid CNIE format. Expected: AA123456", "error")
             return redirect("/admin/users/create")
@@ -441,30 +430,26 @@ def create_user():
             flash("Region is required for voters", "error")
             return redirect("/admin/users/create")
         
-        conn = get_connection()
+        conn = get_db()
         cur = conn.cursor()
         
         try:
-            # Check if CNIE already exists
-            cur.execute("SELECT User_ID FROM User_account WHERE CNIE = %s", (cnie,))
-            if cur.fetchone():
-                flash(f"CNIE {cnie} already exists", "error")
-                cur.close()
-                conn.close()
-                return redirect("/admin/users/create")
-            
-            # Insert user
+            # Insert user; no row comes back if the CNIE already exists
             cur.execute("""
                 INSERT INTO User_account (CNIE, name, role)
                 VALUES (%s, %s, %s)
+                ON CONFLICT (CNIE) DO NOTHING
                 RETURNING User_ID
             """, (cnie, name, role))
             
             result = cur.fetchone()
-            user_id = result[0] if result else None
+            if not result:
+                conn.rollback()
+                flash(f"CNIE {cnie} already exists", "error")
+                cur.close()
+                return redirect("/admin/users/create")
             
-            if not user_id:
-                raise Exception("Failed to create user")
+            user_id = result[0]
             
             # If voter, create voter record
             if role == "Voter" and region_id:
@@ -478,26 +463,17 @@ def create_user():
             flash(f"User '{name}' created successfully with CNIE: {cnie}", "success")
             
             cur.close()
-            conn.close()
             
             return redirect("/admin/users")
             
         except Exception as e:
             conn.rollback()
             cur.close()
-            conn.close()
             flash(f"Error creating user: {str(e)}", "error")
             return redirect("/admin/users/create")
     
     # GET - show form
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT Region_ID, name FROM Region ORDER BY name")
-    regions = cur.fetchall()
-    cur.close()
-    conn.close()
-    
-    return render_template("admin_create_user.html", regions=regions)
+    return render_template("admin_create_user.html", regions=get_regions())
 
 # Audit Log
 @admin_bp.route("/audit")
@@ -506,37 +482,42 @@ def audit_log():
     if check:
         return check
     
-    # Pagination (NEW)
-    page = request.args.get('page', 1, type=int)
+    # Keyset pagination: each page starts just after the (timestamp, Log_ID)
+    # of the previous page's last row, so no rows are scanned and discarded
     per_page = 50
-    offset = (page - 1) * per_page
+    before_id = request.args.get('before_id', type=int)
+    try:
+        before_ts = parse_iso(request.args['before_ts']) if before_id is not None else None
+    except (KeyError, ValueError):
+        before_ts = None
     
-    conn = get_connection()
+    conn = get_db(autocommit=True)
     cur = conn.cursor()
     
-    # Get total count
-    cur.execute("SELECT COUNT(*) FROM Audit_log")
-    total_logs = cur.fetchone()[0]
-    total_pages = (total_logs + per_page - 1) // per_page
-    
-    # Get paginated logs
-    cur.execute("""
+    # One extra row tells us whether an older page exists; the first page
+    # seeks from 'infinity' so every page shares one prepared statement
+    execute_prepared(cur, "admin_audit_page", """
         SELECT a.Log_ID, u.name, u.role, a.action, a.table_name, 
                a.timestamp, a.ip_address
         FROM Audit_log a
         LEFT JOIN User_account u ON a.User_ID = u.User_ID
-        ORDER BY a.timestamp DESC
-        LIMIT %s OFFSET %s
-    """, (per_page, offset))
+        WHERE (a.timestamp, a.Log_ID) < ($1, $2)
+        ORDER BY a.timestamp DESC, a.Log_ID DESC
+        LIMIT $3
+    """, (before_ts or 'infinity', before_id or 0, per_page + 1))
     logs = cur.fetchall()
     
     cur.close()
-    conn.close()
+    
+    next_page = None
+    if len(logs) > per_page:
+        logs = logs[:per_page]
+        next_page = {"before_ts": logs[-1][5].isoformat(), "before_id": logs[-1][0]}
     
     return render_template("admin_audit.html", 
                          logs=logs,
-                         page=page,
-                         total_pages=total_pages)
+                         next_page=next_page,
+                         is_first_page=before_ts is None)
 
 # Regions Management
 @admin_bp.route("/regions")
@@ -545,7 +526,7 @@ def regions():
     if check:
         return check
     
-    conn = get_connection()
+    conn = get_db(autocommit=True)
     cur = conn.cursor()
     
     cur.execute("""
@@ -561,6 +542,5 @@ def regions():
     regions = cur.fetchall()
     
     cur.close()
-    conn.close()
     
     return render_template("admin_regions.html", regions=regions)
@@ -5,7 +5,7 @@ FIXED: Added flash messages, better error handling, input validation
 """
 
 from flask import Blueprint, render_template, request, redirect, session, flash
-from db import get_connection
+from db import get_db
 from utils import log_audit, validate_cnie
 
 auth_bp = Blueprint('auth', __name__)
@@ -33,16 +33,43 @@ def login():
             flash("Invalid CNIE format. Expected: AA123456", "error")
             return render_template("login.html")
         
-        conn = get_connection()
+        conn = get_db()
         cur = conn.cursor()
         
         # Business Rule #26: CNIE must be unique for all users
-        cur.execute("SELECT User_ID, CNIE, name, role FROM User_account WHERE CNIE = %s", (cnie,))
-        user = cur.fetchone()
+        # Business Rule #3-5: Auto-register voter in Voter table if role = Voter
+        # Lookup and auto-registration share one round-trip; a new voter is
+        # assigned the default region (1) until an admin reassigns them.
+        # Only a first login inserts (returning voters would otherwise burn
+        # a Voter_ID sequence value); ON CONFLICT covers two racing first logins
+        try:
+            cur.execute("""
+                WITH u AS (
+                    SELECT User_ID, CNIE, name, role
+                    FROM User_account WHERE CNIE = %s
+                ), ins AS (
+                    INSERT INTO Voter (User_ID, Region_ID)
+                    SELECT User_ID, 1 FROM u
+                    WHERE role = 'Voter'
+                      AND NOT EXISTS (SELECT 1 FROM Voter WHERE User_ID = u.User_ID)
+                    ON CONFLICT (User_ID) DO NOTHING
+                    RETURNING Voter_ID
+                )
+                SELECT u.User_ID, u.CNIE, u.name, u.role,
+                       ins.Voter_ID IS NOT NULL AS auto_registered
+                FROM u LEFT JOIN ins ON TRUE
+            """, (cnie,))
+            user = cur.fetchone()
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            cur.close()
+            flash(f"Error registering voter: {str(e)}", "error")
+            return render_template("login.html")
+        
+        cur.close()
         
         if user is None:
-            cur.close()
-            conn.close()
             log_audit(f"Failed login attempt", details=f"CNIE: {cnie}")
             flash("User not found. Please check your CNIE.", "error")
             return render_template("login.html")
@@ -55,30 +82,8 @@ def login():
             "role": user[3]
         }
         
-        # Business Rule #3-5: Auto-register voter in Voter table if role = Voter
-        if session["user"]["role"] == "Voter":
-            cur.execute("SELECT Voter_ID, Region_ID FROM Voter WHERE User_ID = %s", (user[0],))
-            voter = cur.fetchone()
-            
-            if voter is None:
-                # New voter - needs to be assigned a region by admin
-                # For now, assign default region (1)
-                try:
-                    cur.execute("""
-                        INSERT INTO Voter (User_ID, Region_ID)
-                        VALUES (%s, %s)
-                    """, (user[0], 1))
-                    conn.commit()
-                    log_audit("Auto-registered new voter", "Voter", user[0])
-                except Exception as e:
-                    conn.rollback()
-                    cur.close()
-                    conn.close()
-                    flash(f"Error registering voter: {str(e)}", "error")
-                    return render_template("login.html")
-        
-        cur.close()
-        conn.close()
+        if user[4]:
+            log_audit("Auto-registered new voter", "Voter", user[0])
         
         log_audit(f"Successful login", details=f"Role: {session['user']['role']}")
         
@@ -113,7 +118,7 @@ def profile():
     
     user_id = session["user"]["id"]
     
-    conn = get_connection()
+    conn = get_db(autocommit=True)
     cur = conn.cursor()
     
     cur.execute("""
@@ -134,6 +139,5 @@ def profile():
         voter_info = cur.fetchone()
     
     cur.close()
-    conn.close()
     
     return render_template("profile.html", user=user_info, voter=voter_info)
@@ -4,13 +4,17 @@ Handles voter-related operations including dashboard, voting, and candidate view
 """
 
 from flask import Blueprint, render_template, request, redirect, session, flash
-from db import get_connection
-from utils import log_audit, check_voter_eligibility, get_election_status
+from db import get_db
+from utils import log_audit, check_voter_eligibility, parse_iso
 
 voter_bp = Blueprint('voter', __name__, url_prefix='/voter')
 
+# Rows fetched per round trip when streaming a voter's history
+HISTORY_ITERSIZE = 200
+
+@voter_bp.before_request
 def require_voter():
-    """Middleware to check if user is voter"""
+    """Middleware to check if user is voter (runs before every voter route)"""
     if "user" not in session or session["user"]["role"] != "Voter":
         flash("Please login as a voter to access this page", "error")
         return redirect("/login")
@@ -19,50 +23,46 @@ def require_voter():
 # Voter Dashboard
 @voter_bp.route("/dashboard")
 def dashboard():
-    check = require_voter()
-    if check:
-        return check
-    
     user_id = session["user"]["id"]
     
-    conn = get_connection()
+    conn = get_db(autocommit=True)
     cur = conn.cursor()
     
-    # Get voter info including region
+    # Voter info plus the active/planned elections in the voter's region,
+    # each flagged with whether this voter has already voted in it
     cur.execute("""
-        SELECT v.Voter_ID, v.Region_ID, r.name as region_name, v.is_eligible
+        SELECT v.Voter_ID, r.name as region_name, v.is_eligible,
+               (SELECT json_agg(x ORDER BY x.start_date) FROM (
+                    SELECT e.Election_ID, e.name, e.type,
+                           date_trunc('second', e.start_date) AS start_date,
+                           date_trunc('second', e.end_date) AS end_date, e.status,
+                           EXISTS (SELECT 1 FROM Vote vt
+                                   WHERE vt.Voter_ID = v.Voter_ID
+                                   AND vt.Election_ID = e.Election_ID) AS has_voted
+                    FROM Election e
+                    JOIN Election_Region er ON e.Election_ID = er.Election_ID
+                    WHERE er.Region_ID = v.Region_ID 
+                    AND e.status IN ('Active', 'Planned')
+               ) x) AS elections
         FROM Voter v
         JOIN Region r ON v.Region_ID = r.Region_ID
         WHERE v.User_ID = %s
     """, (user_id,))
     voter_info = cur.fetchone()
     
+    cur.close()
+    
     if not voter_info:
-        cur.close()
-        conn.close()
         return "Voter registration not found. Please contact admin."
     
-    voter_id, region_id, region_name, is_eligible = voter_info
+    voter_id, region_name, is_eligible, elections = voter_info
     
-    # Get active elections in voter's region
-    cur.execute("""
-        SELECT DISTINCT e.Election_ID, e.name, e.type, e.start_date, e.end_date, e.status
-        FROM Election e
-        JOIN Election_Region er ON e.Election_ID = er.Election_ID
-        WHERE er.Region_ID = %s 
-        AND e.status IN ('Active', 'Planned')
-        ORDER BY e.start_date
-    """, (region_id,))
-    elections = cur.fetchall()
-    
-    # Check which elections voter has voted in
-    cur.execute("""
-        SELECT Election_ID FROM Vote WHERE Voter_ID = %s
-    """, (voter_id,))
-    voted_elections = [row[0] for row in cur.fetchall()]
-    
-    cur.close()
-    conn.close()
+    # JSON carries timestamps as ISO strings (truncated to whole seconds above
+    # so datetime.fromisoformat accepts them on every supported Python)
+    elections = elections or []
+    for election in elections:
+        election["start_date"] = parse_iso(election["start_date"])
+        election["end_date"] = parse_iso(election["end_date"])
     
     log_audit("Viewed voter dashboard")
     
@@ -70,19 +70,14 @@ def dashboard():
                          voter_id=voter_id,
                          region_name=region_name,
                          is_eligible=is_eligible,
-                         elections=elections,
-                         voted_elections=voted_elections)
+                         elections=elections)
 
 # View Candidates for an Election
 @voter_bp.route("/election/<int:election_id>/candidates")
 def view_candidates(election_id):
-    check = require_voter()
-    if check:
-        return check
-    
     user_id = session["user"]["id"]
     
-    conn = get_connection()
+    conn = get_db(autocommit=True)
     cur = conn.cursor()
     
     # Get voter info
@@ -91,7 +86,6 @@ def view_candidates(election_id):
     
     if not voter_info:
         cur.close()
-        conn.close()
         return "Voter not found"
     
     voter_id, voter_region_id = voter_info
@@ -128,7 +122,6 @@ def view_candidates(election_id):
     voted_for = cur.fetchone()
     
     cur.close()
-    conn.close()
     
     log_audit("Viewed candidates", "Election", election_id)
     
@@ -143,10 +136,6 @@ def view_candidates(election_id):
 # Cast Vote
 @voter_bp.route("/vote", methods=["POST"])
 def vote():
-    check = require_voter()
-    if check:
-        return check
-    
     candidate_id = request.form.get("candidate_id")
     election_id = request.form.get("election_id")
     user_id = session["user"]["id"]
@@ -154,90 +143,115 @@ def vote():
     if not candidate_id or not election_id:
         return "Missing required fields"
     
-    conn = get_connection()
-    cur = conn.cursor()
-    
-    # Get voter ID
-    cur.execute("SELECT Voter_ID, Region_ID FROM Voter WHERE User_ID = %s", (user_id,))
-    voter_info = cur.fetchone()
-    
-    if not voter_info:
-        cur.close()
-        conn.close()
-        return "Voter not found"
-    
-    voter_id, voter_region = voter_info
-    
-    # Check eligibility
-    eligible, message = check_voter_eligibility(voter_id, election_id)
-    
-    if not eligible:
-        cur.close()
-        conn.close()
-        return message
-    
-    # Verify candidate is in same region and election
-    cur.execute("""
-        SELECT Region_ID, Election_ID 
-        FROM Candidate 
-        WHERE Candidate_ID = %s AND is_approved = TRUE
-    """, (candidate_id,))
-    candidate_info = cur.fetchone()
-    
-    if not candidate_info:
-        cur.close()
-        conn.close()
+    try:
+        candidate_id = int(candidate_id)
+        election_id = int(election_id)
+    except ValueError:
         return "Invalid candidate"
     
-    candidate_region, candidate_election = candidate_info
-    
-    # Business Rule #27 & #28: Region validation
-    if candidate_region != voter_region:
-        cur.close()
-        conn.close()
-        return "Cannot vote for candidate from different region"
-    
-    if candidate_election != int(election_id):
-        cur.close()
-        conn.close()
-        return "Candidate not in this election"
-    
-    # Check election status
-    election_status = get_election_status(election_id)
-    if election_status != "Active":
-        cur.close()
-        conn.close()
-        return f"Election is not active (Status: {election_status})"
+    conn = get_db()
+    cur = conn.cursor()
     
     try:
         # Business Rule #17 & #18: Cast vote (immutable)
+        # Business Rule #27 & #28: Region validation
+        # Every guard is part of the INSERT itself, so nothing can change
+        # between the checks and the vote being recorded
         cur.execute("""
             INSERT INTO Vote (Voter_ID, Election_ID, Candidate_ID)
-            VALUES (%s, %s, %s)
-        """, (voter_id, election_id, candidate_id))
+            SELECT v.Voter_ID, e.Election_ID, c.Candidate_ID
+            FROM Voter v
+            JOIN Candidate c ON c.Candidate_ID = %(candidate_id)s
+                AND c.Election_ID = %(election_id)s
+                AND c.Region_ID = v.Region_ID
+                AND c.is_approved = TRUE
+            JOIN Election e ON e.Election_ID = c.Election_ID
+                AND e.status = 'Active'
+                AND LOCALTIMESTAMP BETWEEN e.start_date AND e.end_date
+            JOIN Election_Region er ON er.Election_ID = e.Election_ID
+                AND er.Region_ID = v.Region_ID
+            WHERE v.User_ID = %(user_id)s
+            AND v.is_eligible = TRUE
+            AND NOT EXISTS (SELECT 1 FROM Vote
+                            WHERE Voter_ID = v.Voter_ID AND Election_ID = e.Election_ID)
+            RETURNING Vote_ID
+        """, {"candidate_id": candidate_id, "election_id": election_id, "user_id": user_id})
+        
+        if cur.fetchone() is None:
+            conn.rollback()
+            message = vote_rejection_reason(cur, user_id, election_id, candidate_id)
+            cur.close()
+            return message
         
         conn.commit()
         
         log_audit("Cast vote", "Vote", None, f"Election: {election_id}, Candidate: {candidate_id}")
         
         cur.close()
-        conn.close()
         
         return redirect(f"/voter/vote/success?election_id={election_id}")
     
     except Exception as e:
         conn.rollback()
         cur.close()
-        conn.close()
         return f"Error casting vote: {str(e)}"
 
+def vote_rejection_reason(cur, user_id, election_id, candidate_id):
+    """
+    Explain why the guarded INSERT in vote() recorded nothing
+    Only runs on the failure path; gathers every check in one query and
+    reports the first one that failed
+    """
+    cur.execute("""
+        SELECT v.is_eligible,
+               EXISTS (SELECT 1 FROM Vote
+                       WHERE Voter_ID = v.Voter_ID AND Election_ID = %(election_id)s),
+               EXISTS (SELECT 1 FROM Election_Region
+                       WHERE Election_ID = %(election_id)s AND Region_ID = v.Region_ID),
+               c.Candidate_ID IS NOT NULL,
+               c.Region_ID = v.Region_ID,
+               c.Election_ID = %(election_id)s,
+               CASE
+                   WHEN e.status = 'Active'
+                        AND LOCALTIMESTAMP BETWEEN e.start_date AND e.end_date THEN 'Active'
+                   WHEN e.status = 'Active' AND LOCALTIMESTAMP > e.end_date THEN 'Completed'
+                   WHEN e.status = 'Active' THEN 'Planned'
+                   ELSE e.status
+               END
+        FROM Voter v
+        LEFT JOIN Candidate c ON c.Candidate_ID = %(candidate_id)s AND c.is_approved = TRUE
+        LEFT JOIN Election e ON e.Election_ID = %(election_id)s
+        WHERE v.User_ID = %(user_id)s
+    """, {"candidate_id": candidate_id, "election_id": election_id, "user_id": user_id})
+    checks = cur.fetchone()
+    
+    if not checks:
+        return "Voter not found"
+    
+    (is_eligible, already_voted, in_region, candidate_found,
+     same_region, same_election, election_status) = checks
+    
+    if not is_eligible:
+        return "Voter account is not eligible"
+    if already_voted:
+        return "You have already voted in this election"
+    if not in_region:
+        return "This election is not available in your region"
+    if not candidate_found:
+        return "Invalid candidate"
+    if not same_region:
+        return "Cannot vote for candidate from different region"
+    if not same_election:
+        return "Candidate not in this election"
+    if election_status != "Active":
+        return f"Election is not active (Status: {election_status})"
+    
+    # Every check passes now, so a concurrent request changed something
+    return "Error casting vote: please try again"
+
 # Vote Success Page
 @voter_bp.route("/vote/success")
 def vote_success():
-    check = require_voter()
-    if check:
-        return check
-    
     election_id = request.args.get("election_id")
     
     return render_template("voter_vote_success.html", election_id=election_id)
@@ -245,28 +259,27 @@ def vote_success():
 # View Voting History
 @voter_bp.route("/history")
 def voting_history():
-    check = require_voter()
-    if check:
-        return check
-    
     user_id = session["user"]["id"]
     
-    conn = get_connection()
+    # Not autocommit: the server-side cursor below lives in a transaction
+    conn = get_db()
     cur = conn.cursor()
     
     # Get voter ID
     cur.execute("SELECT Voter_ID FROM Voter WHERE User_ID = %s", (user_id,))
     voter = cur.fetchone()
+    cur.close()
     
     if not voter:
-        cur.close()
-        conn.close()
         return "Voter not found"
     
     voter_id = voter[0]
     
-    # Get voting history
-    cur.execute("""
+    # Get voting history from a server-side cursor, streamed to the template
+    # HISTORY_ITERSIZE rows per round trip instead of fetched all at once
+    history = conn.cursor(name=f"vh_{voter_id}")
+    history.itersize = HISTORY_ITERSIZE
+    history.execute("""
         SELECT e.name as election_name, e.type, v.vote_timestamp,
                u.name as candidate_name, c.party_name
         FROM Vote v
@@ -276,11 +289,12 @@ def voting_history():
         WHERE v.Voter_ID = %s
         ORDER BY v.vote_timestamp DESC
     """, (voter_id,))
-    history = cur.fetchall()
-    
-    cur.close()
-    conn.close()
     
     log_audit("Viewed voting history")
     
-    return render_template("voter_history.html", history=history)
+    # Render while the cursor is still open, then end the read transaction
+    page = render_template("voter_history.html", history=history)
+    history.close()
+    conn.rollback()
+    
+    return page
@@ -3,23 +3,78 @@ Database connection module for NEMIS
 FIXED: Corrected database name to match schema
 """
 import psycopg2
+import psycopg2.extensions
+import psycopg2.pool
+import logging
 import os
 import sys
+import threading
+from flask import g, has_app_context
+
+logger = logging.getLogger('nemis')
+
+# Connection pool shared by all request handlers (created on first use)
+POOL_MIN_CONN = int(os.environ.get('DB_POOL_MIN', 5))
+POOL_MAX_CONN = max(int(os.environ.get('DB_POOL_MAX', 20)), POOL_MIN_CONN)
+# Seconds a caller waits for a free connection before giving up
+POOL_WAIT_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 30))
+
+# Connection settings, read from the environment once at import
+DB_PARAMS = {
+    'dbname': os.environ.get('DB_NAME', 'NEMIS'),  # FIXED: Changed from 'nemis' to 'NEMIS'
+    'user': os.environ.get('DB_USER', 'postgres'),
+    'password': os.environ.get('DB_PASSWORD', 'postgres'),
+    'host': os.environ.get('DB_HOST', 'localhost'),
+    'port': os.environ.get('DB_PORT', '5432'),
+}
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+# One slot per connection the pool may hand out: getconn() raises at once
+# when the pool is exhausted, so callers queue here instead
+_POOL_SLOTS = threading.BoundedSemaphore(POOL_MAX_CONN)
+
+class NemisConnection(psycopg2.extensions.connection):
+    """
+    Pooled connection that remembers which server-side prepared
+    statements already exist in its session
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+
+def _get_pool():
+    """
+    Return the process-wide connection pool, creating it on first use
+    """
+    global _POOL
+    if _POOL is None:
+        with _POOL_LOCK:
+            if _POOL is None:
+                _POOL = psycopg2.pool.ThreadedConnectionPool(
+                    POOL_MIN_CONN,
+                    POOL_MAX_CONN,
+                    connection_factory=NemisConnection,
+                    **DB_PARAMS
+                )
+    return _POOL
 
 def get_connection():
     """
-    Create and return a connection to the NEMIS database
+    Check out a connection to the NEMIS database from the pool
     Uses environment variables if available, falls back to defaults
+    Every connection must be handed back with release_connection()
+    Waits up to POOL_WAIT_TIMEOUT seconds when all connections are in use,
+    then raises psycopg2.pool.PoolError
     """
+    if not _POOL_SLOTS.acquire(timeout=POOL_WAIT_TIMEOUT):
+        raise psycopg2.pool.PoolError("connection pool exhausted")
     try:
-        return psycopg2.connect(
-            dbname=os.environ.get('DB_NAME', 'NEMIS'),  # FIXED: Changed from 'nemis' to 'NEMIS'
-            user=os.environ.get('DB_USER', 'postgres'),
-            password=os.environ.get('DB_PASSWORD', 'postgres'),
-            host=os.environ.get('DB_HOST', 'localhost'),
-            port=os.environ.get('DB_PORT', '5432')
-        )
-    except psycopg2.OperationalError as e:
+        conn = _get_pool().getconn()
+    except BaseException as e:
+        _POOL_SLOTS.release()
+        if not isinstance(e, psycopg2.OperationalError):
+            raise
         error_msg = str(e)
         print("\n" + "="*70)
         print("❌ DATABASE CONNECTION FAILED")
@@ -33,10 +88,10 @@ def get_connection():
             print("\n  2. Or edit db.py line 16 with your password")
             print("\n  3. Reset PostgreSQL password in pgAdmin")
             print("\n  Current settings:")
-            print(f"     Database: {os.environ.get('DB_NAME', 'NEMIS')}")
-            print(f"     User: {os.environ.get('DB_USER', 'postgres')}")
-            print(f"     Host: {os.environ.get('DB_HOST', 'localhost')}")
-            print(f"     Port: {os.environ.get('DB_PORT', '5432')}")
+            print(f"     Database: {DB_PARAMS['dbname']}")
+            print(f"     User: {DB_PARAMS['user']}")
+            print(f"     Host: {DB_PARAMS['host']}")
+            print(f"     Port: {DB_PARAMS['port']}")
         elif "database" in error_msg and "does not exist" in error_msg:
             print("\n📊 ISSUE: Database 'NEMIS' does not exist!")
             print("\nSOLUTION:")
@@ -54,6 +109,78 @@ def get_connection():
         print("\n" + "="*70)
         raise
 
+    # Remember checkouts made during a request so teardown can return leaks
+    if has_app_context():
+        g.setdefault('_checked_out', []).append(conn)
+    return conn
+
+def release_connection(conn, close=False):
+    """
+    Return a connection obtained from get_connection() to the pool
+    Any open transaction is rolled back by the pool; pass close=True to
+    discard a broken connection instead of reusing it
+    """
+    if conn is None:
+        return
+    if has_app_context():
+        checked_out = g.get('_checked_out', [])
+        if conn in checked_out:
+            checked_out.remove(conn)
+    _return_to_pool(conn, close)
+
+def _return_to_pool(conn, close=False):
+    """
+    Hand a connection back to the pool in its default (transactional) mode
+    """
+    if not close and not conn.closed and conn.autocommit:
+        conn.autocommit = False
+    try:
+        _get_pool().putconn(conn, close=close)
+    finally:
+        _POOL_SLOTS.release()
+
+def execute_prepared(cur, name, query, params=()):
+    """
+    Execute query as a server-side prepared statement called name
+    The statement (written with $1..$n placeholders) is PREPAREd the first
+    time a connection runs it; afterwards only EXECUTE is sent, skipping
+    the parse/plan step on the server
+    """
+    conn = cur.connection
+    if name not in conn.prepared:
+        cur.execute(f"PREPARE {name} AS {query}")
+        conn.prepared.add(name)
+    
+    if params:
+        placeholders = ", ".join(["%s"] * len(params))
+        cur.execute(f"EXECUTE {name} ({placeholders})", params)
+    else:
+        cur.execute(f"EXECUTE {name}")
+
+def get_db(autocommit=False):
+    """
+    Return the connection bound to the current request
+    The first call checks one out of the pool; later calls (from handlers
+    and utils helpers alike) reuse it until the request is torn down
+    Read-only handlers pass autocommit=True on their first call so their
+    SELECTs run without holding a transaction open; the flag only takes
+    effect when the connection is checked out
+    """
+    if 'db' not in g:
+        g.db = get_connection()
+        if autocommit:
+            g.db.autocommit = True
+    return g.db
+
+def release_request_connections(exception=None):
+    """
+    Flask teardown hook: return the request connection from get_db() and
+    any connection a handler failed to release (e.g. when it raised)
+    """
+    g.pop('db', None)
+    for conn in g.pop('_checked_out', []):
+        _return_to_pool(conn)
+
 def test_connection():
     """
     Test the database connection
@@ -65,10 +192,10 @@ def test_connection():
         cur.execute('SELECT 1')
         result = cur.fetchone()
         cur.close()
-        conn.close()
+        release_connection(conn)
         return result[0] == 1
-    except Exception as e:
-        print(f"Database connection failed: {e}")
+    except Exception:
+        logger.exception("Database connection failed")
         return False
 
 if __name__ == "__main__":
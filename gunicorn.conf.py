@@ -0,0 +1,30 @@
+"""
+Gunicorn configuration for NEMIS
+Picked up automatically when started from this directory:
+    gunicorn nemis:app
+"""
+
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+
+# Threaded workers: psycopg2 releases the GIL while it waits on PostgreSQL,
+# so requests in one worker overlap their database I/O
+workers = int(os.environ.get('GUNICORN_WORKERS', 4))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+
+# Each worker has its own connection pool. Every request thread, the audit
+# writer and the cache listener can hold a connection at once, so the pool
+# keeps at least that many idle (the pool closes any connection returned
+# beyond DB_POOL_MIN, losing its prepared statements) and may grow past it.
+# Set here, before the workers fork and import db.py
+os.environ.setdefault('DB_POOL_MIN', str(threads + 2))
+os.environ.setdefault('DB_POOL_MAX', str(max(20, threads + 2)))
+
+# Reuse client connections between requests
+keepalive = 30
+
+# Not preloaded: the pool and background threads are created after fork,
+# once per worker
+preload_app = False
@@ -6,8 +6,17 @@ FIXED: Removed duplicate app.run(), added security configs, CSRF protection, err
 
 from flask import Flask, render_template
 from flask_wtf.csrf import CSRFProtect
-from datetime import timedelta
+from psycopg2.pool import PoolError
+from datetime import datetime, timedelta
+from logging.handlers import QueueHandler, QueueListener
+import atexit
+import logging
 import os
+import queue
+import time
+
+from db import release_request_connections
+from utils import flush_audit_log
 
 # Import blueprints
 from controllers.auth import auth_bp
@@ -51,6 +60,43 @@ app.register_blueprint(auth_bp)
 app.register_blueprint(admin_bp)
 app.register_blueprint(voter_bp)
 
+# ============================================================
+# DATABASE CONNECTION POOL
+# ============================================================
+
+# Return any pooled connection a handler left checked out (e.g. on exceptions)
+app.teardown_appcontext(release_request_connections)
+
+# ============================================================
+# LOGGING
+# ============================================================
+
+# Request threads only append records to a queue; a listener thread does
+# the formatting and file I/O (also echoed to the console in debug mode)
+debug_mode = os.environ.get('FLASK_DEBUG', 'True') == 'True'
+
+log_queue = queue.Queue(-1)
+log_format = logging.Formatter(
+    '%(asctime)s %(levelname)s [%(process)d:%(threadName)s] %(message)s'
+)
+log_handlers = [logging.FileHandler(os.environ.get('LOG_FILE', 'nemis.log'), encoding='utf-8')]
+if debug_mode:
+    log_handlers.append(logging.StreamHandler())
+for log_handler in log_handlers:
+    log_handler.setFormatter(log_format)
+log_listener = QueueListener(log_queue, *log_handlers)
+log_listener.start()
+
+logger = logging.getLogger('nemis')
+logger.setLevel(logging.INFO)
+logger.addHandler(QueueHandler(log_queue))
+
+@atexit.register
+def shutdown_logging():
+    """Write queued audit events, then drain the log queue"""
+    flush_audit_log()
+    log_listener.stop()
+
 # ============================================================
 # ERROR HANDLERS (NEW)
 # ============================================================
@@ -70,15 +116,30 @@ def forbidden_error(error):
     """Handle 403 errors"""
     return render_template('403.html'), 403
 
+@app.errorhandler(PoolError)
+def pool_exhausted_error(error):
+    """Every database connection stayed busy for DB_POOL_TIMEOUT seconds"""
+    logger.warning("Database connection pool exhausted: %s", error)
+    return render_template('500.html'), 503, {'Retry-After': '5'}
+
 # ============================================================
 # CONTEXT PROCESSORS (NEW)
 # ============================================================
 
+# Current year, recomputed only once the next New Year (local time) passes
+_year_context = {'current_year': None}
+_year_ends = 0.0
+
 @app.context_processor
 def inject_year():
     """Inject current year into all templates"""
-    from datetime import datetime
-    return {'current_year': datetime.now().year}
+    global _year_ends
+    now = time.time()
+    if now >= _year_ends:
+        year = datetime.fromtimestamp(now).year
+        _year_context['current_year'] = year
+        _year_ends = datetime(year + 1, 1, 1).timestamp()
+    return _year_context
 
 # ============================================================
 # APPLICATION STARTUP
@@ -87,9 +148,8 @@ def inject_year():
 if __name__ == "__main__":
     # FIXED: Removed duplicate app.run()
     # Run in debug mode for development only
-    # In production, use: gunicorn -w 4 -b 0.0.0.0:5000 nemis:app
+    # In production, use: gunicorn nemis:app (settings in gunicorn.conf.py)
     
-    debug_mode = os.environ.get('FLASK_DEBUG', 'True') == 'True'
     port = int(os.environ.get('PORT', 5000))
     
     print("=" * 60)
@@ -14,6 +14,7 @@ DROP TABLE IF EXISTS Election CASCADE;
 DROP TABLE IF EXISTS Voter CASCADE;
 DROP TABLE IF EXISTS Region CASCADE;
 DROP TABLE IF EXISTS User_account CASCADE;
+DROP TABLE IF EXISTS Results_refresh CASCADE;
 
 -- Drop functions
 DROP FUNCTION IF EXISTS validate_candidate_region() CASCADE;
@@ -24,6 +25,8 @@ DROP FUNCTION IF EXISTS update_election_status() CASCADE;
 DROP FUNCTION IF EXISTS calculate_turnout() CASCADE;
 DROP FUNCTION IF EXISTS get_election_winner() CASCADE;
 DROP FUNCTION IF EXISTS get_region_statistics() CASCADE;
+DROP FUNCTION IF EXISTS notify_region_changed() CASCADE;
+DROP FUNCTION IF EXISTS notify_results_changed() CASCADE;
 
 -- ============================================================
 -- CORE TABLES
@@ -120,6 +123,9 @@ CREATE TABLE Vote (
 );
 
 -- Audit Log Table (Immutable)
+-- Written in batches by the application's audit writer, whose session uses
+-- synchronous_commit = off. The table stays LOGGED (not UNLOGGED) so a crash
+-- can only lose the last unflushed commits instead of truncating the trail.
 CREATE TABLE Audit_log (
     Log_ID SERIAL PRIMARY KEY,
     User_ID INTEGER REFERENCES User_account(User_ID),
@@ -139,19 +145,23 @@ CREATE TABLE Audit_log (
 
 CREATE INDEX idx_user_role ON User_account(role);
 CREATE INDEX idx_user_cnie ON User_account(CNIE);
+CREATE INDEX idx_user_created ON User_account(created_at DESC);
 CREATE INDEX idx_voter_user ON Voter(User_ID);
 CREATE INDEX idx_voter_region ON Voter(Region_ID);
 CREATE INDEX idx_candidate_election ON Candidate(Election_ID);
 CREATE INDEX idx_candidate_region ON Candidate(Region_ID);
 CREATE INDEX idx_candidate_approved ON Candidate(is_approved) WHERE is_approved = TRUE;
+CREATE INDEX idx_candidate_ballot ON Candidate(Election_ID, Region_ID) WHERE is_approved = TRUE;
+CREATE INDEX idx_candidate_regdate ON Candidate(registration_date DESC);
 CREATE INDEX idx_vote_voter ON Vote(Voter_ID);
-CREATE INDEX idx_vote_election ON Vote(Election_ID);
+CREATE INDEX idx_vote_election ON Vote(Election_ID, Voter_ID);
 CREATE INDEX idx_vote_candidate ON Vote(Candidate_ID);
 CREATE INDEX idx_vote_timestamp ON Vote(vote_timestamp);
 CREATE INDEX idx_election_status ON Election(status);
 CREATE INDEX idx_election_dates ON Election(start_date, end_date);
+CREATE INDEX idx_election_created ON Election(created_at DESC);
 CREATE INDEX idx_audit_user ON Audit_log(User_ID);
-CREATE INDEX idx_audit_timestamp ON Audit_log(timestamp DESC);
+CREATE INDEX idx_audit_timestamp ON Audit_log(timestamp DESC, Log_ID DESC);
 CREATE INDEX idx_audit_table ON Audit_log(table_name);
 
 -- ============================================================
@@ -403,6 +413,45 @@ CREATE TRIGGER track_candidate_approval
     FOR EACH ROW
     EXECUTE FUNCTION set_candidate_approval_date();
 
+-- Tell application caches that region data changed
+CREATE OR REPLACE FUNCTION notify_region_changed()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('region_changed', '');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER region_changed
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON Region
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notify_region_changed();
+
+-- Tell the application that mv_election_results is out of date; the payload
+-- is the changing transaction's txid, checked against Results_refresh
+CREATE OR REPLACE FUNCTION notify_results_changed()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('results_changed', txid_current()::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER vote_results_changed
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON Vote
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notify_results_changed();
+
+CREATE TRIGGER candidate_results_changed
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON Candidate
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notify_results_changed();
+
+CREATE TRIGGER election_results_changed
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON Election
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notify_results_changed();
+
 
 -- ============================================================
 -- VIEWS (Advanced Reporting)
@@ -507,6 +556,24 @@ LEFT JOIN Vote v ON e.Election_ID = v.Election_ID
 GROUP BY e.Election_ID, e.name, e.type, e.status, e.start_date, e.end_date, admin.name
 ORDER BY e.start_date DESC;
 
+-- Election Results, materialized for the admin results page
+-- Refreshed (REFRESH ... CONCURRENTLY) by the application's background
+-- listener shortly after a results_changed notification
+CREATE MATERIALIZED VIEW mv_election_results AS
+SELECT * FROM vw_election_results
+WHERE Candidate_ID IS NOT NULL;
+
+CREATE UNIQUE INDEX idx_mv_election_results ON mv_election_results(Election_ID, Candidate_ID);
+
+-- Snapshot mv_election_results was last refreshed from (single row), so an
+-- application worker can skip a refresh that another worker already made
+CREATE TABLE Results_refresh (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    snapshot txid_snapshot
+);
+
+INSERT INTO Results_refresh DEFAULT VALUES;
+
 -- ============================================================
 -- SAMPLE DATA
 -- ============================================================
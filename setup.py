@@ -4,42 +4,66 @@ NEMIS Complete Setup and Verification Script
 Run this to set up and verify everything is 100% working
 """
 
+import argparse
+import functools
 import subprocess
+import shlex
 import sys
 import os
+import tempfile
 import time
 
 def print_header(text):
     """Print formatted header"""
-    print("\n" + "=" * 70)
-    print(f"  {text}")
-    print("=" * 70 + "\n")
+    rule = "=" * 70
+    print(f"\n{rule}\n  {text}\n{rule}\n", flush=True)
 
 def print_step(number, text):
     """Print step number"""
-    print(f"\n[Step {number}] {text}")
-    print("-" * 70)
+    print(f"\n[Step {number}] {text}\n{'-' * 70}", flush=True)
+
+# Prompt answers preset from the command line (see parse_args)
+ANSWERS = {}
+
+def ask(key, prompt):
+    """Ask a yes/no question, unless its answer was given on the command line"""
+    if key in ANSWERS:
+        print(f"{prompt}{ANSWERS[key]}")
+        return ANSWERS[key]
+    return input(prompt).strip().lower()
+
+@functools.lru_cache(maxsize=None)
+def project_files():
+    """Names of the files in the project directory (listed once per run)"""
+    with os.scandir('.') as entries:
+        return frozenset(entry.name for entry in entries if entry.is_file())
+
+def project_file_exists(name):
+    """Check whether a project file exists"""
+    return name in project_files()
 
-def run_command(cmd, description, check=True):
-    """Run shell command and return success"""
+def run_command(cmd, description):
+    """
+    Run a command (argv list, or a string split like a shell would) and
+    return success; its output is shown live as it is produced
+    """
     print(f"Running: {description}")
+    argv = shlex.split(cmd) if isinstance(cmd, str) else cmd
     try:
-        result = subprocess.run(
-            cmd,
-            shell=True,
-            capture_output=True,
+        process = subprocess.Popen(
+            argv,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
             text=True,
-            check=check
+            bufsize=1
         )
-        if result.stdout:
-            print(result.stdout)
-        if result.returncode == 0:
+        for line in process.stdout:
+            print(line, end='')
+        if process.wait() == 0:
             print(f"✓ {description} - SUCCESS")
             return True
         else:
             print(f"✗ {description} - FAILED")
-            if result.stderr:
-                print(f"Error: {result.stderr}")
             return False
     except Exception as e:
         print(f"✗ {description} - ERROR: {e}")
@@ -51,9 +75,8 @@ def check_postgres():
     
     # Try to connect
     result = run_command(
-        'psql -U postgres -c "SELECT version();" 2>&1',
-        "PostgreSQL connection test",
-        check=False
+        ['psql', '-U', 'postgres', '-c', 'SELECT version();'],
+        "PostgreSQL connection test"
     )
     
     if not result:
@@ -72,43 +95,43 @@ def create_database():
     """Create NEMIS database"""
     print_step(2, "Creating NEMIS Database")
 
+    # Statements for the final psql call; a database being replaced is
+    # dropped in the same session that creates the new one
+    commands = []
+
     # Check if database exists using Python-based approach
     print("Running: Checking if NEMIS database exists")
     try:
+        # Ask the server directly (one psql, no shell pipeline), matching
+        # either spelling of the name
         result = subprocess.run(
-            ['psql', '-U', 'postgres', '-lqt'],
+            ['psql', '-U', 'postgres', '-tAc',
+             "SELECT datname FROM pg_database WHERE lower(datname) = 'nemis'"],
             capture_output=True,
             text=True,
             check=False
         )
+        databases = result.stdout.split()
 
         # Check for both uppercase and lowercase versions
-        database_exists_upper = 'NEMIS' in result.stdout
-        database_exists_lower = 'nemis' in result.stdout and 'NEMIS' not in result.stdout
+        database_exists_upper = 'NEMIS' in databases
+        database_exists_lower = 'nemis' in databases and 'NEMIS' not in databases
 
         if database_exists_upper:
             print("✓ Checking if NEMIS database exists - Database found (uppercase)")
             print("\n⚠️  Database NEMIS already exists!")
-            response = input("Drop and recreate? (yes/no): ").strip().lower()
+            response = ask('recreate_db', "Drop and recreate? (yes/no): ")
             if response == 'yes':
-                run_command(
-                    'psql -U postgres -c "DROP DATABASE \\"NEMIS\\";"',
-                    "Dropping existing database",
-                    check=False
-                )
+                commands.append('DROP DATABASE "NEMIS";')
             else:
                 print("✓ Using existing database")
                 return True
         elif database_exists_lower:
             print("✓ Checking if database exists - Found 'nemis' (lowercase)")
             print("\n⚠️  Database 'nemis' exists but we need 'NEMIS' (uppercase)")
-            response = input("Drop 'nemis' and create 'NEMIS'? (yes/no): ").strip().lower()
+            response = ask('recreate_db', "Drop 'nemis' and create 'NEMIS'? (yes/no): ")
             if response == 'yes':
-                run_command(
-                    'psql -U postgres -c "DROP DATABASE nemis;"',
-                    "Dropping lowercase 'nemis' database",
-                    check=False
-                )
+                commands.append('DROP DATABASE nemis;')
             else:
                 print("✗ Cannot proceed with lowercase database name")
                 return False
@@ -119,21 +142,28 @@ def create_database():
         print("   Attempting to create database anyway...")
 
     # Use quotes to preserve uppercase name
+    commands.append('CREATE DATABASE "NEMIS";')
+
+    # One psql process; each -c still runs in its own transaction, as
+    # DROP/CREATE DATABASE require
     return run_command(
-        'psql -U postgres -c "CREATE DATABASE \\"NEMIS\\";"',
-        "Creating NEMIS database"
+        ['psql', '-U', 'postgres'] + [arg for command in commands for arg in ('-c', command)],
+        "Creating NEMIS database" if len(commands) == 1 else "Recreating NEMIS database"
     )
 
 def load_schema():
     """Load database schema"""
     print_step(3, "Loading Database Schema")
     
-    if not os.path.exists('schema.sql'):
+    if not project_file_exists('schema.sql'):
         print("✗ schema.sql not found in current directory")
         return False
     
+    # One transaction for the whole file: a single commit instead of one
+    # per statement, and a failed load leaves nothing half-created
     result = run_command(
-        'psql -U postgres -d NEMIS -f schema.sql',
+        ['psql', '-U', 'postgres', '-d', 'NEMIS', '-v', 'ON_ERROR_STOP=1',
+         '--single-transaction', '-f', 'schema.sql'],
         "Loading schema (tables, views, functions, triggers)"
     )
     
@@ -153,17 +183,17 @@ def load_sample_data():
     """Load sample data"""
     print_step(4, "Loading Sample Data (Optional)")
     
-    if not os.path.exists('sample_data.sql'):
+    if not project_file_exists('sample_data.sql'):
         print("ℹ️  sample_data.sql not found - skipping")
         return True
     
-    response = input("Load sample data for testing? (yes/no): ").strip().lower()
+    response = ask('sample_data', "Load sample data for testing? (yes/no): ")
     if response != 'yes':
         print("Skipping sample data")
         return True
     
     result = run_command(
-        'psql -U postgres -d NEMIS -f sample_data.sql',
+        ['psql', '-U', 'postgres', '-d', 'NEMIS', '-f', 'sample_data.sql'],
         "Loading sample data (voters, candidates, elections)"
     )
     
@@ -192,31 +222,93 @@ def check_python():
     print("✓ Python version OK")
     return True
 
+# Wheels only where one exists (psycopg2-binary never compiles) and no
+# PyPI round trip for pip's own version check; already-satisfied
+# requirements are not re-downloaded
+PIP_INSTALL = [sys.executable, '-m', 'pip', 'install',
+               '--disable-pip-version-check', '--prefer-binary']
+
+# Background `pip install -r requirements.txt`: (process, output file), until
+# install_dependencies collects it (see start_dependency_install)
+_dependency_install = None
+
+def start_dependency_install():
+    """
+    Start installing requirements.txt in the background. pip needs neither
+    PostgreSQL nor the database, so it downloads while the database steps
+    run; its output goes to a temporary file shown by install_dependencies
+    """
+    global _dependency_install
+    if not project_file_exists('requirements.txt'):
+        return
+    output = tempfile.TemporaryFile(mode='w+')
+    try:
+        process = subprocess.Popen(
+            PIP_INSTALL + ['-r', 'requirements.txt'],
+            stdout=output,
+            stderr=subprocess.STDOUT,
+            text=True
+        )
+    except Exception:
+        # install_dependencies falls back to installing in the foreground
+        output.close()
+        return
+    _dependency_install = (process, output)
+
+def wait_for_dependency_install():
+    """
+    Let a background install that install_dependencies never collected
+    (setup stopped early) run to completion; stopping pip midway could
+    leave a package half-upgraded
+    """
+    global _dependency_install
+    if _dependency_install is None:
+        return
+    process, output = _dependency_install
+    _dependency_install = None
+    if process.poll() is None:
+        print("Waiting for the background dependency installation to finish...")
+        process.wait()
+    output.close()
+
 def install_dependencies():
     """Install Python dependencies"""
+    global _dependency_install
     print_step(6, "Installing Python Dependencies")
 
-    if not os.path.exists('requirements.txt'):
+    if not project_file_exists('requirements.txt'):
         print("✗ requirements.txt not found")
         return False
 
+    pip_install = PIP_INSTALL
+
     # Show actual pip output for debugging
-    print(f"Running: {sys.executable} -m pip install -r requirements.txt")
+    print(f"Running: {' '.join(pip_install)} -r requirements.txt")
     try:
-        result = subprocess.run(
-            f'{sys.executable} -m pip install -r requirements.txt',
-            shell=True,
-            capture_output=True,
-            text=True,
-            check=False
-        )
+        if _dependency_install is not None:
+            process, output = _dependency_install
+            returncode = process.wait()
+            _dependency_install = None
+            output.seek(0)
+            log = output.read()
+            output.close()
+            if log:
+                print(log)
+        else:
+            result = subprocess.run(
+                pip_install + ['-r', 'requirements.txt'],
+                capture_output=True,
+                text=True,
+                check=False
+            )
+            returncode = result.returncode
 
-        if result.stdout:
-            print(result.stdout)
-        if result.stderr:
-            print(result.stderr)
+            if result.stdout:
+                print(result.stdout)
+            if result.stderr:
+                print(result.stderr)
 
-        if result.returncode != 0:
+        if returncode != 0:
             print("\n⚠️  Some packages failed to install.")
             print("This might be due to gunicorn (Linux-only) on Windows.")
             print("\nTrying to install essential packages only...")
@@ -227,8 +319,7 @@ def install_dependencies():
 
             for package in essential:
                 result = subprocess.run(
-                    f'{sys.executable} -m pip install "{package}"',
-                    shell=True,
+                    pip_install + [package],
                     capture_output=True,
                     text=True,
                     check=False
@@ -257,17 +348,17 @@ def test_database():
     """Run database tests"""
     print_step(7, "Running Database Tests")
     
-    if not os.path.exists('test_database.py'):
+    if not project_file_exists('test_database.py'):
         print("ℹ️  test_database.py not found - skipping tests")
         return True
     
-    response = input("Run comprehensive database tests? (yes/no): ").strip().lower()
+    response = ask('run_tests', "Run comprehensive database tests? (yes/no): ")
     if response != 'yes':
         print("Skipping tests")
         return True
     
     return run_command(
-        f'{sys.executable} test_database.py',
+        [sys.executable, '-u', 'test_database.py'],
         "Running all database validation tests"
     )
 
@@ -275,7 +366,7 @@ def start_application():
     """Start Flask application"""
     print_step(8, "Starting Flask Application")
     
-    if not os.path.exists('nemis.py'):
+    if not project_file_exists('nemis.py'):
         print("✗ nemis.py not found")
         return False
     
@@ -288,7 +379,7 @@ def start_application():
     print("   Admin: AD123456")
     print("   Election Officer: EO123456")
     
-    response = input("\nStart application now? (yes/no): ").strip().lower()
+    response = ask('start_app', "\nStart application now? (yes/no): ")
     if response == 'yes':
         print("\n🚀 Starting NEMIS...")
         print("   Press Ctrl+C to stop the server")
@@ -300,8 +391,43 @@ def start_application():
     
     return True
 
+def parse_args():
+    """Parse command-line options and preset the matching prompt answers"""
+    parser = argparse.ArgumentParser(description="NEMIS setup and verification")
+    parser.add_argument('-y', '--yes', action='store_true',
+                        help="answer 'yes' to every prompt not set by another option "
+                             "(a failed step still stops the setup), except dropping "
+                             "an existing database: see --recreate-db/--keep-db")
+    database = parser.add_mutually_exclusive_group()
+    database.add_argument('--recreate-db', dest='recreate_db', action='store_const', const='yes',
+                          help="drop an existing NEMIS/nemis database without asking")
+    database.add_argument('--keep-db', dest='recreate_db', action='store_const', const='no',
+                          help="keep an existing NEMIS database without asking")
+    sample = parser.add_mutually_exclusive_group()
+    sample.add_argument('--with-sample-data', dest='sample_data', action='store_const', const='yes',
+                        help="load sample_data.sql without asking")
+    sample.add_argument('--no-sample-data', dest='sample_data', action='store_const', const='no',
+                        help="skip the sample data without asking")
+    tests = parser.add_mutually_exclusive_group()
+    tests.add_argument('--run-tests', dest='run_tests', action='store_const', const='yes',
+                       help="run test_database.py without asking")
+    tests.add_argument('--skip-tests', dest='run_tests', action='store_const', const='no',
+                       help="skip the database tests without asking")
+    parser.add_argument('--no-start', dest='start_app', action='store_const', const='no',
+                        help="do not offer to start the application at the end")
+    args = parser.parse_args()
+    
+    if args.yes:
+        # Never recreate_db: dropping a database takes an explicit --recreate-db
+        ANSWERS.update(dict.fromkeys(('continue', 'sample_data', 'run_tests', 'start_app'), 'yes'))
+        ANSWERS['continue_on_failure'] = 'no'
+    for key in ('recreate_db', 'sample_data', 'run_tests', 'start_app'):
+        if getattr(args, key):
+            ANSWERS[key] = getattr(args, key)
+
 def main():
     """Main setup routine"""
+    parse_args()
     print_header("NEMIS Complete Setup & Verification")
     print("This script will:")
     print("  1. Verify PostgreSQL installation")
@@ -312,7 +438,7 @@ def main():
     print("  6. Run database tests")
     print("  7. Start the application")
     
-    response = input("\nContinue with setup? (yes/no): ").strip().lower()
+    response = ask('continue', "\nContinue with setup? (yes/no): ")
     if response != 'yes':
         print("Setup cancelled.")
         return
@@ -330,17 +456,22 @@ def main():
     ]
     
     failed = []
-    for step_func, step_name in steps:
-        try:
-            if not step_func():
+    start_dependency_install()
+    try:
+        for step_func, step_name in steps:
+            try:
+                if not step_func():
+                    failed.append(step_name)
+                    response = ask('continue_on_failure', f"\n⚠️  {step_name} had issues. Continue anyway? (yes/no): ")
+                    if response != 'yes':
+                        break
+            except Exception as e:
+                print(f"✗ Error in {step_name}: {e}")
                 failed.append(step_name)
-                response = input(f"\n⚠️  {step_name} had issues. Continue anyway? (yes/no): ").strip().lower()
-                if response != 'yes':
-                    break
-        except Exception as e:
-            print(f"✗ Error in {step_name}: {e}")
-            failed.append(step_name)
-            break
+                break
+    finally:
+        # pip was already started; never exit silently while it still runs
+        wait_for_dependency_install()
     
     # Final summary
     print_header("Setup Complete!")
@@ -6,7 +6,6 @@ Tests all database features for database course evaluation
 
 import psycopg2
 from psycopg2 import sql
-from datetime import datetime, timedelta
 import sys
 
 def test_connection():
@@ -25,15 +24,66 @@ def test_connection():
         print(f"✗ Connection failed: {e}")
         return None
 
-def test_tables(conn):
-    """Test all tables exist"""
+# Every schema object the structure tests look at, fetched in one query as
+# (kind, name, detail) rows. Only system catalogs are read, so a missing or
+# broken table cannot make the whole query fail
+CATALOG_QUERY = """
+    SELECT 'table' AS kind, table_name::text AS name, NULL::text AS detail
+    FROM information_schema.tables
+    WHERE table_schema = 'public' AND table_type = 'BASE TABLE'
+    UNION ALL
+    SELECT 'view', table_name::text, NULL
+    FROM information_schema.views
+    WHERE table_schema = 'public'
+    UNION ALL
+    SELECT 'function', routine_name::text, NULL
+    FROM information_schema.routines
+    WHERE routine_schema = 'public' AND routine_type = 'FUNCTION'
+    UNION ALL
+    SELECT 'trigger', trigger_name::text, event_object_table::text
+    FROM information_schema.triggers
+    WHERE trigger_schema = 'public'
+    UNION ALL
+    SELECT 'index', indexname::text, tablename::text
+    FROM pg_indexes
+    WHERE schemaname = 'public'
+    UNION ALL
+    SELECT 'check', constraint_name::text, NULL
+    FROM information_schema.check_constraints
+    WHERE constraint_schema = 'public'
+    UNION ALL
+    SELECT 'unique', constraint_name::text, table_name::text
+    FROM information_schema.table_constraints
+    WHERE constraint_schema = 'public' AND constraint_type = 'UNIQUE'
+    UNION ALL
+    SELECT 'foreign key', constraint_name::text, table_name::text
+    FROM information_schema.table_constraints
+    WHERE constraint_schema = 'public' AND constraint_type = 'FOREIGN KEY'
+    ORDER BY kind, name
+"""
+
+def load_catalog(conn):
+    """
+    Fetch the schema catalog in one round trip
+    Returns: dict of kind -> [(name, detail), ...], or None if the query failed
+    """
+    catalog = {}
     cur = conn.cursor()
-    cur.execute("""
-        SELECT table_name FROM information_schema.tables 
-        WHERE table_schema = 'public' AND table_type = 'BASE TABLE'
-        ORDER BY table_name
-    """)
-    tables = [row[0] for row in cur.fetchall()]
+    try:
+        cur.execute(CATALOG_QUERY)
+        for kind, name, detail in cur.fetchall():
+            catalog.setdefault(kind, []).append((name, detail))
+    except Exception as e:
+        conn.rollback()
+        print(f"✗ Schema catalog query failed: {e}")
+        catalog = None
+    
+    cur.close()
+    return catalog
+
+def test_tables(catalog):
+    """Test all tables exist"""
+    tables = [name for name, _ in catalog.get('table', [])]
     
     expected_tables = ['audit_log', 'candidate', 'election', 'election_phase', 
                        'election_region', 'region', 'user_account', 'vote', 'voter']
@@ -44,18 +94,11 @@ def test_tables(conn):
         return False
     
     print(f"✓ All {len(tables)} tables exist")
-    cur.close()
     return True
 
-def test_views(conn):
+def test_views(catalog):
     """Test all views exist"""
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT table_name FROM information_schema.views 
-        WHERE table_schema = 'public'
-        ORDER BY table_name
-    """)
-    views = [row[0] for row in cur.fetchall()]
+    views = [name for name, _ in catalog.get('view', [])]
     
     expected_views = ['vw_candidate_statistics', 'vw_election_overview', 
                       'vw_election_results', 'vw_voter_turnout']
@@ -66,18 +109,11 @@ def test_views(conn):
         return False
     
     print(f"✓ All {len(views)} views exist")
-    cur.close()
     return True
 
-def test_functions(conn):
+def test_functions(catalog):
     """Test all functions exist"""
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT routine_name FROM information_schema.routines 
-        WHERE routine_schema = 'public' AND routine_type = 'FUNCTION'
-        ORDER BY routine_name
-    """)
-    functions = [row[0] for row in cur.fetchall()]
+    functions = [name for name, _ in catalog.get('function', [])]
     
     expected = ['calculate_turnout', 'get_election_winner', 'get_region_statistics']
     
@@ -90,16 +126,9 @@ def test_functions(conn):
     
     return True
 
-def test_triggers(conn):
+def test_triggers(catalog):
     """Test all triggers exist"""
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT trigger_name, event_object_table 
-        FROM information_schema.triggers
-        WHERE trigger_schema = 'public'
-        ORDER BY trigger_name
-    """)
-    triggers = cur.fetchall()
+    triggers = catalog.get('trigger', [])
     
     expected_count = 6  # Should have 6 triggers
     
@@ -111,95 +140,79 @@ def test_triggers(conn):
     for trigger_name, table_name in triggers:
         print(f"  - {trigger_name} on {table_name}")
     
-    cur.close()
     return True
 
-def test_indexes(conn):
+def test_indexes(catalog):
     """Test indexes exist"""
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT COUNT(*) FROM pg_indexes WHERE schemaname = 'public'
-    """)
-    index_count = cur.fetchone()[0]
+    index_count = len(catalog.get('index', []))
     
     if index_count < 15:
         print(f"⚠ Only {index_count} indexes found (expected 15+)")
     else:
         print(f"✓ {index_count} indexes exist for performance")
     
-    cur.close()
     return True
 
-def test_constraints(conn):
+def test_constraints(catalog):
     """Test constraints"""
-    cur = conn.cursor()
-    
     # Test CHECK constraints
-    cur.execute("""
-        SELECT COUNT(*) FROM information_schema.check_constraints
-        WHERE constraint_schema = 'public'
-    """)
-    check_count = cur.fetchone()[0]
+    check_count = len(catalog.get('check', []))
     print(f"✓ {check_count} CHECK constraints enforcing business rules")
     
     # Test UNIQUE constraints
-    cur.execute("""
-        SELECT COUNT(*) FROM information_schema.table_constraints
-        WHERE constraint_schema = 'public' AND constraint_type = 'UNIQUE'
-    """)
-    unique_count = cur.fetchone()[0]
+    unique_count = len(catalog.get('unique', []))
     print(f"✓ {unique_count} UNIQUE constraints preventing duplicates")
     
     # Test FOREIGN KEY constraints
-    cur.execute("""
-        SELECT COUNT(*) FROM information_schema.table_constraints
-        WHERE constraint_schema = 'public' AND constraint_type = 'FOREIGN KEY'
-    """)
-    fk_count = cur.fetchone()[0]
+    fk_count = len(catalog.get('foreign key', []))
     print(f"✓ {fk_count} FOREIGN KEY constraints maintaining referential integrity")
     
-    cur.close()
     return True
 
 def test_sample_data(conn):
     """Test sample data exists"""
     cur = conn.cursor()
+    cur.execute("""
+        SELECT (SELECT COUNT(*) FROM Region),
+               (SELECT COUNT(*) FROM User_account WHERE role IN ('Admin', 'Election Officer'))
+    """)
+    region_count, admin_count = cur.fetchone()
+    cur.close()
     
     # Check regions
-    cur.execute("SELECT COUNT(*) FROM Region")
-    region_count = cur.fetchone()[0]
     if region_count != 12:
         print(f"✗ Expected 12 regions, found {region_count}")
         return False
     print(f"✓ {region_count} Moroccan regions loaded")
     
     # Check admin users
-    cur.execute("SELECT COUNT(*) FROM User_account WHERE role IN ('Admin', 'Election Officer')")
-    admin_count = cur.fetchone()[0]
     if admin_count < 2:
         print(f"✗ Expected 2+ admin users, found {admin_count}")
         return False
     print(f"✓ {admin_count} admin users created")
     
-    cur.close()
     return True
 
 def test_query_performance(conn):
     """Test query performance"""
     cur = conn.cursor()
     
-    start = datetime.now()
+    # Server-side execution time only: the rows are not sent to the client
     cur.execute("""
+        EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON)
         SELECT e.name, COUNT(v.Vote_ID) as vote_count
         FROM Election e
         LEFT JOIN Vote v ON e.Election_ID = v.Election_ID
         GROUP BY e.Election_ID, e.name
         ORDER BY vote_count DESC
     """)
-    results = cur.fetchall()
-    duration = (datetime.now() - start).total_seconds()
+    plan = cur.fetchone()[0][0]
+    duration = plan['Execution Time'] / 1000
     
     print(f"✓ Complex query executed in {duration:.3f} seconds")
+    print(f"  Plan: {plan['Plan']['Node Type']}, "
+          f"{plan['Plan'].get('Shared Hit Blocks', 0)} cached / "
+          f"{plan['Plan'].get('Shared Read Blocks', 0)} read blocks")
     
     cur.close()
     return True
@@ -209,10 +222,14 @@ def test_trigger_validation(conn):
     cur = conn.cursor()
     
     try:
-        # Try to update audit log (should fail)
-        cur.execute("INSERT INTO Audit_log (action) VALUES ('Test Action')")
-        log_id = cur.lastrowid
-        cur.execute("UPDATE Audit_log SET action = 'Modified' WHERE Log_ID = %s", (log_id,))
+        # Try to update audit log (should fail). Both statements go in one
+        # round trip; the UPDATE targets the new row through currval (it
+        # must be a separate statement to see the row at all)
+        cur.execute("""
+            INSERT INTO Audit_log (action) VALUES ('Test Action');
+            UPDATE Audit_log SET action = 'Modified'
+            WHERE Log_ID = currval(pg_get_serial_sequence('audit_log', 'log_id'));
+        """)
         conn.rollback()
         print("✗ Audit log protection trigger not working")
         return False
@@ -240,29 +257,40 @@ def run_all_tests():
         print("\n✗ FAILED: Cannot connect to database")
         return False
     
+    # One round trip for everything the structure tests inspect; the data
+    # and live tests below run their own queries
+    catalog = load_catalog(conn)
+    
     print()
     print("Testing Database Structure:")
     print("-" * 60)
     
+    # (name, test, argument): structure tests read the catalog, the others
+    # query the database
     tests = [
-        ("Tables", test_tables),
-        ("Views", test_views),
-        ("Functions", test_functions),
-        ("Triggers", test_triggers),
-        ("Indexes", test_indexes),
-        ("Constraints", test_constraints),
-        ("Sample Data", test_sample_data),
-        ("Query Performance", test_query_performance),
-        ("Trigger Validation", test_trigger_validation)
+        ("Tables", test_tables, catalog),
+        ("Views", test_views, catalog),
+        ("Functions", test_functions, catalog),
+        ("Triggers", test_triggers, catalog),
+        ("Indexes", test_indexes, catalog),
+        ("Constraints", test_constraints, catalog),
+        ("Sample Data", test_sample_data, conn),
+        ("Query Performance", test_query_performance, conn),
+        ("Trigger Validation", test_trigger_validation, conn)
     ]
     
     results = []
-    for test_name, test_func in tests:
+    for test_name, test_func, argument in tests:
         print()
+        if argument is None:
+            print(f"✗ {test_name} test skipped: schema catalog unavailable")
+            results.append(False)
+            continue
         try:
-            result = test_func(conn)
+            result = test_func(argument)
             results.append(result)
         except Exception as e:
+            conn.rollback()  # keep later tests out of the aborted transaction
             print(f"✗ {test_name} test failed with error: {e}")
             results.append(False)
     
@@ -3,37 +3,215 @@ Utility functions for NEMIS (ENHANCED VERSION)
 Including audit logging, validation, and helper functions
 """
 
-from db import get_connection
-from datetime import datetime
+from db import get_db, get_connection, release_connection, execute_prepared
+from datetime import date, datetime, timedelta
 from flask import request, session
+from functools import lru_cache
+import psycopg2
+import psycopg2.extensions
+import psycopg2.extras
+import io
+import logging
+import queue
 import re
+import select
+import struct
+import threading
+import time
+
+logger = logging.getLogger('nemis')
+
+# Validation patterns, compiled once at import
+_NAME_RE = re.compile(r'^[a-zA-ZÀ-ÿ\s\'-]+$')
+_EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+
+# C0/C1 control characters except tab and newline, for str.translate
+_CONTROL_CHARS = dict.fromkeys(c for c in range(0x20) if c not in (0x09, 0x0A))
+_CONTROL_CHARS.update(dict.fromkeys(range(0x7F, 0xA0)))
 
 # ============================================================
 # AUDIT LOGGING
 # ============================================================
 
+# Request threads only enqueue audit events; a background thread writes
+# them in batches (up to AUDIT_BATCH_SIZE rows, or whatever arrived within
+# AUDIT_FLUSH_INTERVAL seconds) with one multi-row INSERT and one commit.
+# If the queue is full the event is dropped rather than blocking a request.
+#
+# The writer's session runs with synchronous_commit = off: a commit returns
+# before its WAL is flushed, so a database crash can lose the last few
+# hundred milliseconds of audit entries (never corrupt or reorder them).
+# Audit_log itself stays a logged table; votes and all other writes keep
+# full synchronous durability.
+AUDIT_QUEUE_SIZE = 8192
+AUDIT_BATCH_SIZE = 500
+AUDIT_FLUSH_INTERVAL = 0.05
+AUDIT_COPY_THRESHOLD = 200  # batches at least this large go through binary COPY
+
+_AUDIT_Q = queue.Queue(maxsize=AUDIT_QUEUE_SIZE)
+_audit_lock = threading.Lock()
+_audit_write_lock = threading.RLock()
+_audit_thread = None
+_audit_conn = None
+audit_dropped = 0
+
 def log_audit(action, table_name=None, record_id=None, details=None):
     """
     Log an audit entry for significant actions
     Business Rule #23-25: All significant actions must be recorded and immutable
+    The entry is queued and written asynchronously by the audit writer thread
     """
+    global audit_dropped
+    
+    user_id = session.get("user", {}).get("id") if "user" in session else None
+    ip_address = request.remote_addr if request else None
+    event = (user_id, action, table_name, record_id, datetime.now(), ip_address, details)
+    
+    _start_audit_writer()
     try:
-        conn = get_connection()
-        cur = conn.cursor()
-        
-        user_id = session.get("user", {}).get("id") if "user" in session else None
-        ip_address = request.remote_addr if request else None
-        
-        cur.execute("""
-            INSERT INTO Audit_log (User_ID, action, table_name, record_id, ip_address, details)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """, (user_id, action, table_name, record_id, ip_address, details))
-        
-        conn.commit()
-        cur.close()
-        conn.close()
-    except Exception as e:
-        print(f"Audit log error: {e}")
+        _AUDIT_Q.put_nowait(event)
+    except queue.Full:
+        with _audit_lock:
+            audit_dropped += 1
+        logger.warning("Audit log queue full, dropped '%s'", action)
+
+def _start_audit_writer():
+    """
+    Start the background audit writer on first use (after any fork, so
+    each worker process gets its own thread)
+    """
+    global _audit_thread
+    if _audit_thread is None:
+        with _audit_lock:
+            if _audit_thread is None:
+                _audit_thread = threading.Thread(target=_audit_writer, name="nemis-audit", daemon=True)
+                _audit_thread.start()
+
+def _audit_writer():
+    """
+    Background loop: collect a batch of queued events and write it
+    """
+    while True:
+        batch = [_AUDIT_Q.get()]
+        deadline = time.monotonic() + AUDIT_FLUSH_INTERVAL
+        while len(batch) < AUDIT_BATCH_SIZE:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(_AUDIT_Q.get(timeout=timeout))
+            except queue.Empty:
+                break
+        _write_audit_batch(batch)
+
+def _write_audit_batch(batch):
+    """
+    Insert a batch of audit events in a single statement and commit
+    The writer keeps its own pooled connection; a broken one is discarded
+    and the batch retried once on a fresh connection, and a batch rejected
+    by the database is retried row by row
+    """
+    global _audit_conn
+    with _audit_write_lock:
+        for attempt in range(2):
+            try:
+                if _audit_conn is None:
+                    _audit_conn = _open_audit_connection()
+                with _audit_conn.cursor() as cur:
+                    if len(batch) >= AUDIT_COPY_THRESHOLD:
+                        encoding = psycopg2.extensions.encodings[_audit_conn.encoding]
+                        cur.copy_expert("""
+                            COPY Audit_log (User_ID, action, table_name, record_id,
+                                            timestamp, ip_address, details)
+                            FROM STDIN WITH (FORMAT binary)
+                        """, _audit_copy_payload(batch, encoding))
+                    else:
+                        psycopg2.extras.execute_values(cur, """
+                            INSERT INTO Audit_log (User_ID, action, table_name, record_id,
+                                                   timestamp, ip_address, details)
+                            VALUES %s
+                        """, batch, page_size=AUDIT_BATCH_SIZE)
+                _audit_conn.commit()
+                return
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                if _audit_conn is not None:
+                    release_connection(_audit_conn, close=True)
+                    _audit_conn = None
+                if attempt:
+                    logger.exception("Audit log error (%d entries lost)", len(batch))
+            except Exception:
+                if _audit_conn is not None:
+                    _audit_conn.rollback()
+                if len(batch) > 1:
+                    # One bad row should not cost the whole batch
+                    for event in batch:
+                        _write_audit_batch([event])
+                else:
+                    logger.exception("Audit log error (entry lost)")
+                return
+
+# PostgreSQL binary COPY framing (see the COPY reference, "Binary Format")
+_COPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+_COPY_TRAILER = struct.pack("!h", -1)
+_COPY_NULL = struct.pack("!i", -1)
+_PG_EPOCH = datetime(2000, 1, 1)
+
+def _copy_int4(value, encoding):
+    return struct.pack("!ii", 4, int(value))
+
+def _copy_text(value, encoding):
+    data = str(value).encode(encoding)
+    return struct.pack("!i", len(data)) + data
+
+def _copy_timestamp(value, encoding):
+    # timestamp without time zone: microseconds since 2000-01-01
+    return struct.pack("!iq", 8, (value - _PG_EPOCH) // timedelta(microseconds=1))
+
+# One encoder per column of an audit event tuple, in COPY column order
+_AUDIT_COPY_COLUMNS = (_copy_int4, _copy_text, _copy_text, _copy_int4,
+                       _copy_timestamp, _copy_text, _copy_text)
+
+def _audit_copy_payload(batch, encoding):
+    """
+    Encode audit events as a binary COPY stream
+    """
+    buf = io.BytesIO()
+    buf.write(_COPY_HEADER)
+    field_count = struct.pack("!h", len(_AUDIT_COPY_COLUMNS))
+    for event in batch:
+        buf.write(field_count)
+        for encode, value in zip(_AUDIT_COPY_COLUMNS, event):
+            buf.write(_COPY_NULL if value is None else encode(value, encoding))
+    buf.write(_COPY_TRAILER)
+    buf.seek(0)
+    return buf
+
+def _open_audit_connection():
+    """
+    Check out the writer's connection and relax commit durability for it
+    The setting is session-wide, so this connection is only ever closed,
+    never handed back to the pool for reuse
+    """
+    conn = get_connection()
+    with conn.cursor() as cur:
+        cur.execute("SET synchronous_commit = off")
+    conn.commit()
+    return conn
+
+def flush_audit_log():
+    """
+    Synchronously write any events still queued
+    Called at interpreter exit by nemis.shutdown_logging, before the log
+    queue is drained
+    """
+    batch = []
+    while True:
+        try:
+            batch.append(_AUDIT_Q.get_nowait())
+        except queue.Empty:
+            break
+    if batch:
+        _write_audit_batch(batch)
 
 # ============================================================
 # VALIDATION FUNCTIONS (NEW)
@@ -47,8 +225,12 @@ def validate_cnie(cnie):
     if not cnie or not isinstance(cnie, str):
         return False
     
-    pattern = r'^[A-Z]{2}\d{6}$'
-    return bool(re.match(pattern, cnie.strip()))
+    # Fixed 8-character format: test the character classes directly rather
+    # than running a regex (ASCII only, like the CNIE CHECK in schema.sql)
+    cnie = cnie.strip()
+    return (len(cnie) == 8 and cnie.isascii()
+            and cnie[:2].isalpha() and cnie[:2].isupper()
+            and cnie[2:].isdigit())
 
 def validate_name(name):
     """
@@ -63,8 +245,7 @@ def validate_name(name):
         return False
     
     # Allow letters (including accented), spaces, hyphens, and apostrophes
-    pattern = r'^[a-zA-ZÀ-ÿ\s\'-]+$'
-    return bool(re.match(pattern, name))
+    return bool(_NAME_RE.match(name))
 
 def validate_email(email):
     """
@@ -73,8 +254,13 @@ def validate_email(email):
     if not email or not isinstance(email, str):
         return False
     
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return bool(re.match(pattern, email.strip()))
+    # RFC 5321 caps addresses at 254 characters; checking the length first
+    # also bounds the regex's backtracking on long, malformed domains
+    email = email.strip()
+    if len(email) > 254:
+        return False
+    
+    return bool(_EMAIL_RE.match(email))
 
 def validate_date_range(start_date, end_date):
     """
@@ -82,9 +268,9 @@ def validate_date_range(start_date, end_date):
     """
     try:
         if isinstance(start_date, str):
-            start_date = datetime.fromisoformat(start_date)
+            start_date = parse_iso(start_date)
         if isinstance(end_date, str):
-            end_date = datetime.fromisoformat(end_date)
+            end_date = parse_iso(end_date)
         
         return start_date < end_date
     except:
@@ -105,10 +291,162 @@ def sanitize_input(text, max_length=None):
         text = text[:max_length]
     
     # Remove control characters except newlines and tabs
-    text = ''.join(char for char in text if char.isprintable() or char in '\n\t')
+    # translate() strips the common ones in C; the per-character pass is only
+    # needed for the rare remaining non-printables (e.g. zero-width or
+    # line-separator characters)
+    text = text.translate(_CONTROL_CHARS)
+    if not text.replace('\n', '').replace('\t', '').isprintable():
+        text = ''.join(char for char in text if char.isprintable() or char in '\n\t')
     
     return text
 
+# ============================================================
+# CHANGE NOTIFICATIONS & CACHES
+# ============================================================
+
+# Near-static reference data is cached per process. A background thread
+# LISTENs on the channels below (fed by triggers in schema.sql) and drops
+# the affected cache entries whenever the underlying rows change.
+LISTEN_POLL_TIMEOUT = 5.0
+LISTEN_RETRY_DELAY = 5.0
+
+_REGION_CACHE = {}
+_region_list = None
+_region_cache_generation = 0
+_cache_lock = threading.Lock()
+_listener_thread = None
+
+def invalidate_region_cache(payload=None):
+    """
+    Forget all cached region data
+    """
+    global _region_list, _region_cache_generation
+    with _cache_lock:
+        _REGION_CACHE.clear()
+        _region_list = None
+        _region_cache_generation += 1
+
+# mv_election_results is never refreshed on the request path: notifications
+# carry the txid of the changing transaction, and the listener thread
+# refreshes the view at most once every RESULTS_REFRESH_INTERVAL seconds.
+# Results_refresh records the snapshot the view was last refreshed from, so
+# a worker skips the refresh when another worker's already covers its
+# changes; an advisory lock keeps two workers from refreshing at once
+RESULTS_REFRESH_INTERVAL = 10.0
+RESULTS_REFRESH_LOCK = 0x4E454D4953  # 'NEMIS'
+
+_results_generation = 1
+_results_pending = set()  # txids not yet known to be in the view (None: unknown)
+
+def invalidate_election_results(payload=None):
+    """
+    Mark mv_election_results (and the dashboard figures) as out of date
+    payload: txid of the transaction that changed the results
+    """
+    global _results_generation
+    with _cache_lock:
+        _results_generation += 1
+        _results_pending.add(int(payload) if payload and payload.isdigit() else None)
+
+def _refresh_election_results(conn, txids):
+    """
+    Refresh mv_election_results unless the last refresh (by any worker)
+    already includes every transaction in txids
+    Returns: False if another worker is refreshing right now
+    """
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_try_advisory_lock(%s)", (RESULTS_REFRESH_LOCK,))
+        if not cur.fetchone()[0]:
+            return False
+        try:
+            if None not in txids:
+                cur.execute("""
+                    SELECT bool_and(txid_visible_in_snapshot(t, snapshot))
+                    FROM Results_refresh, unnest(%s::bigint[]) t
+                """, (list(txids),))
+                if cur.fetchone()[0]:
+                    return True
+            
+            # Taken before the refresh, whose own snapshot is newer
+            cur.execute("SELECT txid_current_snapshot()")
+            snapshot = cur.fetchone()[0]
+            cur.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY mv_election_results")
+            cur.execute("UPDATE Results_refresh SET snapshot = %s", (snapshot,))
+        finally:
+            cur.execute("SELECT pg_advisory_unlock(%s)", (RESULTS_REFRESH_LOCK,))
+    return True
+
+# Admin dashboard figures: reused for DASHBOARD_CACHE_TTL seconds, or until
+# a results_changed notification (votes, candidates, elections) arrives
+DASHBOARD_CACHE_TTL = 30.0
+_dashboard_cache = None  # (results generation, expiry, statistics)
+
+# NOTIFY channel -> handler(payload)
+_CHANNEL_HANDLERS = {
+    'region_changed': invalidate_region_cache,
+    'results_changed': invalidate_election_results,
+}
+
+def start_change_listener():
+    """
+    Start the notification listener on first use
+    """
+    global _listener_thread
+    if _listener_thread is None:
+        with _cache_lock:
+            if _listener_thread is None:
+                _listener_thread = threading.Thread(target=_change_listener, name="nemis-listen", daemon=True)
+                _listener_thread.start()
+
+def _change_listener():
+    """
+    Background loop: LISTEN on every cache channel, dispatch notifications
+    and refresh mv_election_results when it is stale
+    Reconnects after errors; caches are flushed on (re)connect because any
+    notification sent while disconnected was missed
+    """
+    while True:
+        conn = None
+        try:
+            conn = get_connection()
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                for channel in _CHANNEL_HANDLERS:
+                    cur.execute(f"LISTEN {channel}")
+                # A transaction committed after LISTEN: any refresh that
+                # includes it also includes every change we could have missed
+                cur.execute("SELECT txid_current()::text")
+                marker = cur.fetchone()[0]
+            for handler in _CHANNEL_HANDLERS.values():
+                handler(marker)
+            
+            next_refresh = 0.0
+            while True:
+                timeout = LISTEN_POLL_TIMEOUT
+                if _results_pending:
+                    timeout = min(timeout, max(0.0, next_refresh - time.monotonic()))
+                if select.select([conn], [], [], timeout) != ([], [], []):
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        _CHANNEL_HANDLERS[notify.channel](notify.payload)
+                
+                # Changes arriving within the interval share one refresh;
+                # if another worker holds the lock, retry after the interval
+                # (usually finding its refresh already covers these changes)
+                if _results_pending and time.monotonic() >= next_refresh:
+                    next_refresh = time.monotonic() + RESULTS_REFRESH_INTERVAL
+                    with _cache_lock:
+                        txids = set(_results_pending)
+                    if _refresh_election_results(conn, txids):
+                        with _cache_lock:
+                            _results_pending.difference_update(txids)
+        except Exception:
+            logger.exception("Cache listener error")
+            if conn is not None:
+                release_connection(conn, close=True)
+            time.sleep(LISTEN_RETRY_DELAY)
+
 # ============================================================
 # USER & REGION HELPERS
 # ============================================================
@@ -117,14 +455,9 @@ def get_user_region(user_id):
     """
     Get the region of a voter
     """
-    conn = get_connection()
-    cur = conn.cursor()
-    
-    cur.execute("SELECT Region_ID FROM Voter WHERE User_ID = %s", (user_id,))
-    result = cur.fetchone()
-    
-    cur.close()
-    conn.close()
+    with get_db().cursor() as cur:
+        cur.execute("SELECT Region_ID FROM Voter WHERE User_ID = %s", (user_id,))
+        result = cur.fetchone()
     
     return result[0] if result else None
 
@@ -133,35 +466,60 @@ def get_user_info(user_id):
     Get complete user information
     Returns: (user_id, cnie, name, role, created_at) or None
     """
-    conn = get_connection()
-    cur = conn.cursor()
-    
-    cur.execute("""
-        SELECT User_ID, CNIE, name, role, created_at
-        FROM User_account
-        WHERE User_ID = %s
-    """, (user_id,))
-    result = cur.fetchone()
-    
-    cur.close()
-    conn.close()
+    with get_db().cursor() as cur:
+        cur.execute("""
+            SELECT User_ID, CNIE, name, role, created_at
+            FROM User_account
+            WHERE User_ID = %s
+        """, (user_id,))
+        result = cur.fetchone()
     
     return result
 
 def get_region_name(region_id):
     """
     Get region name by ID
+    Served from the process-wide region cache after the first lookup
     """
-    conn = get_connection()
-    cur = conn.cursor()
+    start_change_listener()
+    name = _REGION_CACHE.get(region_id)
+    if name is not None:
+        return name
     
-    cur.execute("SELECT name FROM Region WHERE Region_ID = %s", (region_id,))
-    result = cur.fetchone()
+    generation = _region_cache_generation
+    with get_db().cursor() as cur:
+        cur.execute("SELECT name FROM Region WHERE Region_ID = %s", (region_id,))
+        result = cur.fetchone()
     
-    cur.close()
-    conn.close()
+    if not result:
+        return None
     
-    return result[0] if result else None
+    with _cache_lock:
+        # Skip the store if the cache was invalidated while we were querying
+        if generation == _region_cache_generation:
+            _REGION_CACHE[region_id] = result[0]
+    return result[0]
+
+def get_regions():
+    """
+    Get all regions as (Region_ID, name) rows ordered by name
+    Served from the process-wide region cache after the first lookup
+    """
+    global _region_list
+    start_change_listener()
+    regions = _region_list
+    if regions is not None:
+        return regions
+    
+    generation = _region_cache_generation
+    with get_db().cursor() as cur:
+        cur.execute("SELECT Region_ID, name FROM Region ORDER BY name")
+        regions = cur.fetchall()
+    
+    with _cache_lock:
+        if generation == _region_cache_generation:
+            _region_list = regions
+    return regions
 
 # ============================================================
 # VOTER ELIGIBILITY
@@ -173,47 +531,28 @@ def check_voter_eligibility(voter_id, election_id):
     Business Rule #27: Voters cannot vote in elections outside their region
     Returns: (is_eligible: bool, message: str)
     """
-    conn = get_connection()
-    cur = conn.cursor()
-    
-    # Get voter's region
-    cur.execute("SELECT Region_ID, is_eligible FROM Voter WHERE Voter_ID = %s", (voter_id,))
-    voter_info = cur.fetchone()
+    with get_db().cursor() as cur:
+        # Voter status, region membership and prior vote in one round-trip
+        cur.execute("""
+            SELECT v.is_eligible,
+                   EXISTS (SELECT 1 FROM Election_Region
+                           WHERE Election_ID = %s AND Region_ID = v.Region_ID),
+                   EXISTS (SELECT 1 FROM Vote
+                           WHERE Voter_ID = v.Voter_ID AND Election_ID = %s)
+            FROM Voter v
+            WHERE v.Voter_ID = %s
+        """, (election_id, election_id, voter_id))
+        voter_info = cur.fetchone()
     
     if not voter_info:
-        cur.close()
-        conn.close()
         return False, "Voter not found"
     
-    voter_region, is_eligible_status = voter_info
+    is_eligible_status, is_in_region, already_voted = voter_info
     
     # Check if voter is marked as eligible
     if not is_eligible_status:
-        cur.close()
-        conn.close()
         return False, "Voter account is not eligible"
     
-    # Check if election is available in voter's region
-    cur.execute("""
-        SELECT COUNT(*) FROM Election_Region 
-        WHERE Election_ID = %s AND Region_ID = %s
-    """, (election_id, voter_region))
-    
-    result = cur.fetchone()
-    is_in_region = result[0] > 0 if result else False
-    
-    # Check if voter already voted
-    cur.execute("""
-        SELECT COUNT(*) FROM Vote 
-        WHERE Voter_ID = %s AND Election_ID = %s
-    """, (voter_id, election_id))
-    
-    result = cur.fetchone()
-    already_voted = result[0] > 0 if result else False
-    
-    cur.close()
-    conn.close()
-    
     if already_voted:
         return False, "You have already voted in this election"
     
@@ -231,36 +570,22 @@ def get_election_status(election_id):
     Get the current status of an election
     Auto-updates status based on current date/time
     """
-    conn = get_connection()
-    cur = conn.cursor()
-    
-    cur.execute("""
-        SELECT status, start_date, end_date 
-        FROM Election 
-        WHERE Election_ID = %s
-    """, (election_id,))
-    
-    result = cur.fetchone()
-    cur.close()
-    conn.close()
-    
-    if not result:
-        return None
-    
-    status, start_date, end_date = result
-    now = datetime.now()
-    
-    # Auto-determine status based on dates if status is Planned or Active
-    if status in ['Planned', 'Active']:
-        if now < start_date:
-            return "Planned"
-        elif start_date <= now <= end_date:
-            return "Active"
-        elif now > end_date:
-            return "Completed"
+    with get_db().cursor() as cur:
+        # Planned/Active elections derive their status from the dates;
+        # Cancelled and Completed are returned as stored
+        cur.execute("""
+            SELECT CASE
+                WHEN status NOT IN ('Planned', 'Active') THEN status
+                WHEN LOCALTIMESTAMP < start_date THEN 'Planned'
+                WHEN LOCALTIMESTAMP <= end_date THEN 'Active'
+                ELSE 'Completed'
+            END
+            FROM Election 
+            WHERE Election_ID = %s
+        """, (election_id,))
+        result = cur.fetchone()
     
-    # Return status as-is for Cancelled or already Completed
-    return status
+    return result[0] if result else None
 
 def is_election_active(election_id):
     """
@@ -276,9 +601,27 @@ def format_percentage(value, total):
     """
     Format a percentage value
     """
-    if total == 0:
+    if not total:
         return "0.00%"
-    return f"{(value / total * 100):.2f}%"
+    
+    if not (isinstance(value, int) and isinstance(total, int)):
+        return f"{(value / total * 100):.2f}%"
+    
+    # Counts: hundredths of a percent in exact integer arithmetic, rounded
+    # half to even
+    hundredths, remainder = divmod(value * 10000, total)
+    if 2 * remainder > total or (2 * remainder == total and hundredths % 2):
+        hundredths += 1
+    return f"{hundredths // 100}.{hundredths % 100:02d}%"
+
+@lru_cache(maxsize=1024)
+def parse_iso(value):
+    """
+    Parse an ISO 8601 string (form input, JSON payload) into a datetime
+    Cached per distinct string; values read through psycopg2 are already
+    datetime objects and never need this
+    """
+    return datetime.fromisoformat(value)
 
 def format_datetime(dt, format_str="%Y-%m-%d %H:%M"):
     """
@@ -287,11 +630,14 @@ def format_datetime(dt, format_str="%Y-%m-%d %H:%M"):
     if dt is None:
         return "N/A"
     
-    if isinstance(dt, str):
-        try:
-            dt = datetime.fromisoformat(dt)
-        except:
-            return dt
+    # Fast path: database values arrive as datetime/date objects
+    if isinstance(dt, (datetime, date)):
+        return dt.strftime(format_str)
+    
+    try:
+        dt = parse_iso(dt)
+    except (TypeError, ValueError):
+        return dt
     
     return dt.strftime(format_str)
 
@@ -310,31 +656,20 @@ def get_election_statistics(election_id):
     Get comprehensive statistics for an election
     Returns: dict with total_votes, total_voters, turnout_percentage, etc.
     """
-    conn = get_connection()
-    cur = conn.cursor()
-    
-    # Get total votes
-    cur.execute("SELECT COUNT(*) FROM Vote WHERE Election_ID = %s", (election_id,))
-    total_votes = cur.fetchone()[0]
-    
-    # Get number of eligible voters for this election (voters in election regions)
-    cur.execute("""
-        SELECT COUNT(DISTINCT v.Voter_ID)
-        FROM Voter v
-        JOIN Election_Region er ON v.Region_ID = er.Region_ID
-        WHERE er.Election_ID = %s AND v.is_eligible = TRUE
-    """, (election_id,))
-    total_eligible_voters = cur.fetchone()[0]
-    
-    # Get number of candidates
-    cur.execute("""
-        SELECT COUNT(*) FROM Candidate 
-        WHERE Election_ID = %s AND is_approved = TRUE
-    """, (election_id,))
-    total_candidates = cur.fetchone()[0]
-    
-    cur.close()
-    conn.close()
+    with get_db().cursor() as cur:
+        # Votes cast, eligible voters in the election's regions and approved
+        # candidates, returned as a single row
+        cur.execute("""
+            SELECT
+                (SELECT COUNT(*) FROM Vote WHERE Election_ID = %s),
+                (SELECT COUNT(DISTINCT v.Voter_ID)
+                 FROM Voter v
+                 JOIN Election_Region er ON v.Region_ID = er.Region_ID
+                 WHERE er.Election_ID = %s AND v.is_eligible = TRUE),
+                (SELECT COUNT(*) FROM Candidate
+                 WHERE Election_ID = %s AND is_approved = TRUE)
+        """, (election_id, election_id, election_id))
+        total_votes, total_eligible_voters, total_candidates = cur.fetchone()
     
     turnout_percentage = format_percentage(total_votes, total_eligible_voters) if total_eligible_voters > 0 else "0.00%"
     
@@ -345,6 +680,50 @@ def get_election_statistics(election_id):
         'turnout_percentage': turnout_percentage
     }
 
+def get_dashboard_statistics():
+    """
+    Get the admin dashboard figures
+    Returns: dict with total_voters, total_elections, total_candidates,
+    total_votes and recent_elections (the 5 newest)
+    """
+    global _dashboard_cache
+    start_change_listener()
+    generation = _results_generation
+    cached = _dashboard_cache
+    if cached and cached[0] == generation and cached[1] > time.monotonic():
+        return cached[2]
+    
+    with get_db(autocommit=True).cursor() as cur:
+        # The four counts are repeated on each of the (up to 5) recent
+        # election rows, so everything comes back in one round trip
+        execute_prepared(cur, "admin_dashboard", """
+            SELECT s.*, e.Election_ID, e.name, e.type, e.start_date, e.end_date, e.status
+            FROM (SELECT (SELECT COUNT(*) FROM User_account WHERE role = 'Voter') AS voters,
+                         (SELECT COUNT(*) FROM Election) AS elections,
+                         (SELECT COUNT(*) FROM Candidate) AS candidates,
+                         (SELECT COUNT(*) FROM Vote) AS votes) s
+            LEFT JOIN LATERAL (
+                SELECT Election_ID, name, type, start_date, end_date, status, created_at
+                FROM Election 
+                ORDER BY created_at DESC 
+                LIMIT 5
+            ) e ON TRUE
+            ORDER BY e.created_at DESC
+        """)
+        rows = cur.fetchall()
+    
+    total_voters, total_elections, total_candidates, total_votes = rows[0][:4]
+    statistics = {
+        'total_voters': total_voters,
+        'total_elections': total_elections,
+        'total_candidates': total_candidates,
+        'total_votes': total_votes,
+        'recent_elections': [row[4:] for row in rows if row[4] is not None]
+    }
+    
+    _dashboard_cache = (generation, time.monotonic() + DASHBOARD_CACHE_TTL, statistics)
+    return statistics
+
 # ============================================================
 # ERROR MESSAGES
 # ============================================================